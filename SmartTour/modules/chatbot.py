@@ -5,12 +5,15 @@ import streamlit as st
 
 from .src.chatbot.bot import (
     initialize_conversation,
-    chatbot_conversation  # ya importado
+    chatbot_conversation_stream
 )
 
 import json
 from .src.rag.app.ollama_interface import OllamaClient
 
+# Cliente de larga vida: reutiliza las conexiones y la lista de modelos entre reruns
+ollama_client = OllamaClient()
+
 def render(state):
     # Custom CSS styling for chat bubbles
     st.markdown(
@@ -85,7 +88,6 @@ def render(state):
         state["chat_history"] = []
 
     # Selección de modelo Ollama
-    ollama_client = OllamaClient()
     available_models = ollama_client.list_models()
     if not available_models:
         st.sidebar.error("No Ollama models found. Please add a model to Ollama.")
@@ -170,35 +172,40 @@ def render(state):
 
         # Placeholder para la respuesta del asistente
         assistant_placeholder = st.empty()
-        streamed_text = ""
 
-        # Spinner animado mientras se genera la respuesta
+        def render_assistant(text):
+            assistant_placeholder.markdown(
+                f"""
+                <div class="chat-row chat-row-assistant">
+                    <div style="flex:1"></div>
+                    <div class="chat-bubble-assistant">{text}</div>
+                    <div class="chat-avatar">🤖</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+        # Spinner solo durante la extracción y validación de los datos; la respuesta llega en streaming
         spinner_text = SPINNER_TEXTS.get(state["language"], SPINNER_TEXTS["English"])
         with st.spinner(spinner_text):
             # Construir historial para el modelo (sin el system prompt)
             conversation_history = state.get("conversation", [])
             if not conversation_history:
                 conversation_history = initialize_conversation(state["language"], state["ollama_model"])
-            # Llama al método chatbot_conversation en vez de usar ollama_client directamente
-            response = chatbot_conversation(
+            tokens = chatbot_conversation_stream(
                 user_input,
                 conversation_history,
                 state["collected_data"],
                 state["language"],
                 state["ollama_model"]
             )
-            streamed_text = response
-            # Actualiza el mensaje del asistente en tiempo real (no hay streaming, solo respuesta final)
-            assistant_placeholder.markdown(
-                f"""
-                <div class="chat-row chat-row-assistant">
-                    <div style="flex:1"></div>
-                    <div class="chat-bubble-assistant">{streamed_text}</div>
-                    <div class="chat-avatar">🤖</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        # Actualiza el mensaje del asistente a medida que llegan los tokens
+        streamed_parts = []
+        for token in tokens:
+            streamed_parts.append(token)
+            render_assistant("".join(streamed_parts))
+        streamed_text = "".join(streamed_parts).strip()
+        render_assistant(streamed_text)
         # Actualiza el historial con la respuesta final
         state["chat_history"][-1] = (user_input, streamed_text)
         # Actualiza la conversación para el próximo turno
@@ -2,11 +2,17 @@ import streamlit as st
 from .src.rag.app.config import load_config
 from .src.rag.app.rag_engine import RAGEngine
 from .src.rag.app.ollama_interface import OllamaClient
-import json
+import uuid
 
 config = load_config()
 ollama = OllamaClient()
 
+@st.cache_resource
+def get_engine():
+    # Un único motor por proceso: índices, ontología y cachés se cargan una vez y se comparten
+    # entre turnos y sesiones (cada turno toma una vista con with_rag)
+    return RAGEngine(config)
+
 def render(state):
 
     # Custom CSS styling for chat bubbles
@@ -141,6 +147,8 @@ def render(state):
     # Session state initialization (use dict keys, not attributes)
     if "chat_history_KB" not in state:
         state["chat_history_KB"] = []
+    if "session_id_KB" not in state:
+        state["session_id_KB"] = uuid.uuid4().hex
 
     # Menú de acciones en el sidebar
     user_action = st.sidebar.selectbox(
@@ -195,27 +203,20 @@ def render(state):
     if user_input or user_action == "Clear" or user_action == "Summarize":
         if user_action == "Clear":
             state["chat_history_KB"] = []
+            get_engine().histories.evict(state["session_id_KB"])
+            state["session_id_KB"] = uuid.uuid4().hex
             st.experimental_rerun()
         elif user_action == "Summarize":
-            engine = RAGEngine(config, use_rag)
+            engine = get_engine().with_rag(use_rag)
             chat_history = state["chat_history_KB"].copy()
-            summary = ""
             with st.spinner("Summarizing conversation..."):
-                for chunk in engine.stream_answer(
+                summary = "".join(engine.stream_answer(
                     "Summarize the conversation so far.",
                     selected_model,
                     chat_history=chat_history,
-                    action_tag="summarize"
-                ):
-                    chunk = chunk.strip()
-                    if chunk.startswith('{'):
-                        try:
-                            data = json.loads(chunk)
-                            summary += data.get("response", "")
-                        except:
-                            continue
-                    else:
-                        summary += chunk
+                    action_tag="summarize",
+                    session_id=state["session_id_KB"]
+                ))
             st.info(summary)
         elif user_input:
             # Mostrar mensaje del usuario inmediatamente
@@ -251,8 +252,8 @@ def render(state):
             )
 
             assistant_placeholder = st.empty()
-            streamed_text = ""
-            engine = RAGEngine(config, use_rag)
+            streamed_parts = []
+            engine = get_engine().with_rag(use_rag)
             chat_history = state["chat_history_KB"].copy()
             action_tag = None
             if user_action == "Important":
@@ -264,19 +265,14 @@ def render(state):
                 user_input.strip(),
                 selected_model,
                 chat_history=chat_history,
-                action_tag=action_tag
+                action_tag=action_tag,
+                session_id=state["session_id_KB"]
             ):
                 if first_chunk:
                     spinner_placeholder.empty()  # Elimina el spinner al recibir el primer chunk
                     first_chunk = False
-                if chunk.strip().startswith("{"):
-                    try:
-                        data = json.loads(chunk)
-                        streamed_text += data.get("response", "")
-                    except:
-                        continue
-                else:
-                    streamed_text += chunk
+                streamed_parts.append(chunk)
+                streamed_text = "".join(streamed_parts)
                 assistant_placeholder.markdown(
                     f"""
                     <div class="chat-row chat-row-assistant">
@@ -288,7 +284,7 @@ def render(state):
                     unsafe_allow_html=True
                 )
             state["chat_history_KB"].append({"role": "user", "content": user_input.strip()})
-            state["chat_history_KB"].append({"role": "assistant", "content": streamed_text})
+            state["chat_history_KB"].append({"role": "assistant", "content": "".join(streamed_parts)})
         # Reiniciar el menú de acción a None después de cada acción
         st.session_state["_sidebar_action"] = 0
 
@@ -1,11 +1,13 @@
 import streamlit as st
-import json
 from .src.recommender.src.user_profile import UserProfile
 from .src.recommender.src.offer_loader import load_offers_from_directory
 from .src.recommender.src.recommender import Recommender
 from .src.recommender.src.utils import display_offer
 from .src.rag.app.ollama_interface import OllamaClient
 
+# Cliente de larga vida: reutiliza las conexiones y la lista de modelos entre reruns
+client = OllamaClient()
+
 def render(state):
     # Session state
     if "selected_recommendations" not in state:
@@ -39,7 +41,6 @@ def render(state):
     # LLM model and language selection in sidebar
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 🤖 Configuración del LLM")
-    client = OllamaClient()
     models_response = client.list_models()
     if isinstance(models_response, dict) and "models" in models_response:
         models = models_response["models"]
@@ -108,44 +109,13 @@ def render(state):
                     f"{prompt_placeholder[language]}\n\nPerfil de usuario:\n{profile_json}\n\nOfertas:\n" +
                     "\n".join([str(o.raw) for o in offer_objs])
                 )
-                explanation = ""
+                explanation_parts = []
                 explanation_placeholder = st.empty()
                 with st.spinner("El modelo LLM está generando la explicación..."):
-                    # Intenta imprimir cada chunk directamente para debug
                     for chunk in client.stream_generate(selected_model, prompt):
-                        try:
-                            # Si el chunk es texto plano, úsalo directamente
-                            if isinstance(chunk, str):
-                                try:
-                                    # Intenta decodificar como JSON, si falla, es texto plano
-                                    data = json.loads(chunk)
-                                    text = data.get("response", "")
-                                    # Solo procesar si hay texto y no está marcado como terminado
-                                    if text and not data.get("done", False):
-                                        explanation += text
-                                        explanation_placeholder.markdown(explanation)
-                                    # Si está marcado como terminado, salir del bucle
-                                    elif data.get("done", False):
-                                        break
-                                except Exception:
-                                    # Si no es JSON válido, es texto plano
-                                    text = chunk
-                                    explanation += text
-                                    explanation_placeholder.markdown(explanation)
-                            else:
-                                # Si es dict, busca el campo 'response'
-                                text = chunk.get("response", "")
-                                if text and not chunk.get("done", False):
-                                    explanation += text
-                                    explanation_placeholder.markdown(explanation)
-                                elif chunk.get("done", False):
-                                    break
-                        except Exception:
-                            # Como último recurso, usar el chunk como string si no está vacío
-                            text = str(chunk).strip()
-                            if text and not text.startswith('{"model"'):
-                                explanation += text
-                                explanation_placeholder.markdown(explanation)
+                        explanation_parts.append(chunk)
+                        explanation_placeholder.markdown("".join(explanation_parts))
+                explanation = "".join(explanation_parts)
                 # Si no se imprimió nada, muestra un mensaje de error
                 if not explanation.strip():
                     explanation_placeholder.error("No se recibió explicación del modelo. Verifica que el modelo esté funcionando correctamente o revisa la conexión.")
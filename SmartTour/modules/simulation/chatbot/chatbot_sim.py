@@ -1,4 +1,5 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 from modules.src.chatbot.bot import (
     initialize_conversation,
     chatbot_conversation,
@@ -62,28 +63,39 @@ def profile_to_text(profile):
     # Convierte el perfil a un string para comparación
     return " ".join([str(profile.get(f, "")) for f in REQUIRED_FIELDS])
 
-def evaluate_extraction_quality(n_runs=30):
-    similarities = []
-    latencies = []
-    for _ in range(n_runs):
-        profile = generate_random_profile()
-        start = time.time()
-        logs, extracted = run_chatbot_simulation(profile)
-        end = time.time()
-        # Convertir ambos perfiles a texto
-        original_text = profile_to_text(profile)
-        extracted_text = profile_to_text(extracted)
-        # Vectorizar y calcular similitud por coseno
-        vectorizer = TfidfVectorizer().fit([original_text, extracted_text])
-        vecs = vectorizer.transform([original_text, extracted_text])
-        sim = cosine_similarity(vecs[0], vecs[1])[0][0]
-        similarities.append(sim)
-        latencies.append(end - start)
+def _evaluate_run(_):
+    profile = generate_random_profile()
+    start = time.time()
+    logs, extracted = run_chatbot_simulation(profile)
+    end = time.time()
+    # Convertir ambos perfiles a texto
+    original_text = profile_to_text(profile)
+    extracted_text = profile_to_text(extracted)
+    # Vectorizar y calcular similitud por coseno
+    vectorizer = TfidfVectorizer().fit([original_text, extracted_text])
+    vecs = vectorizer.transform([original_text, extracted_text])
+    sim = cosine_similarity(vecs[0], vecs[1])[0][0]
+    return sim, end - start
+
+def evaluate_extraction_quality(n_runs=30, max_concurrency=1):
+    """
+    `average_latency` es la duración media de cada conversación. Con una sola a la vez (por defecto)
+    es comparable con las mediciones anteriores; con `max_concurrency` > 1 incluye la espera y la
+    contención en Ollama, y lo que mejora es `wall_time`, el tiempo total de la evaluación.
+    """
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        outcomes = list(pool.map(_evaluate_run, range(n_runs)))
+    wall_time = time.time() - start
+    similarities = [sim for sim, _ in outcomes]
+    latencies = [latency for _, latency in outcomes]
     avg_similarity = sum(similarities) / len(similarities)
     avg_latency = sum(latencies) / len(latencies)
     return {
         "average_cosine_similarity": avg_similarity,
         "average_latency": avg_latency,
+        "wall_time": wall_time,
+        "max_concurrency": max_concurrency,
         "all_similarities": similarities,
         "all_latencies": latencies
     }
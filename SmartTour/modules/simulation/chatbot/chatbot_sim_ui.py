@@ -33,6 +33,7 @@ def render_chatbot_simulator():
         st.success("Evaluation completed!")
         st.metric("Average Cosine Similarity", f"{results['average_cosine_similarity']:.3f}")
         st.metric("Average Latency (s)", f"{results['average_latency']:.2f}")
+        st.metric("Total Time (s)", f"{results['wall_time']:.2f}")
         st.write("All Similarities:", results["all_similarities"])
         st.write("All Latencies:", results["all_latencies"])
 
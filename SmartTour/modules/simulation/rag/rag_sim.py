@@ -1,56 +1,153 @@
-import time
-import json
+import asyncio
+import threading
 from modules.src.rag.app.rag_engine import RAGEngine
+from modules.src.rag.app.ollama_interface import AsyncOllamaClient
 from modules.src.rag.app.config import load_config
 
 import requests  # Add this import for catching connection errors
 
 config = load_config()
 
-def simulate_rag_interaction(query, model, use_rag=True, chat_history=None, action_tag=None):
-    try:
-        engine = RAGEngine(config, use_rag)
-    except (requests.exceptions.ConnectionError, OSError) as e:
-        # Return a result indicating connection error
-        return {
-            "query": query,
-            "response": f"Connection error: {str(e)}",
-            "latency": 0,
-            "source": "ConnectionError",
-            "length": 0,
-            "use_rag": use_rag,
-            "action_tag": action_tag
-        }
-
-    prompt = engine.build_prompt(query, chat_history or [], action_tag)
-
-    response = ""
-    start = time.time()
-    source = "unknown"
-
-    for chunk in engine.stream_answer(query, model, chat_history=chat_history or [], action_tag=action_tag):
-        try:
-            data = json.loads(chunk)
-            chunk_text = data.get("response", "")
-        except:
-            chunk_text = chunk
-        response += chunk_text
-    end = time.time()
-
+def detect_source(prompt):
     # Detección básica de origen (fallback Wikipedia si no hay docs en KB)
     if "wikipedia.org" in prompt.lower() or "ecured" in prompt.lower():
-        source = "Wikipedia"
+        return "Wikipedia"
     elif "Context:\n" in prompt:
-        source = "Knowledge Base"
-    else:
-        source = "None"
+        return "Knowledge Base"
+    return "None"
 
+def connection_error_result(query, error, use_rag=True, action_tag=None):
+    # Return a result indicating connection error
     return {
         "query": query,
-        "response": response.strip(),
-        "latency": round(end - start, 2),
-        "source": source,
-        "length": len(response.split()),
+        "response": f"Connection error: {str(error)}",
+        "latency": 0,
+        "source": "ConnectionError",
+        "length": 0,
         "use_rag": use_rag,
         "action_tag": action_tag
     }
+
+def generation_result(query, prompt, generation, latency, use_rag=True, action_tag=None):
+    response = generation.text.strip()
+    stats = generation.stats
+    return {
+        "query": query,
+        "response": response,
+        "latency": round(latency, 2),
+        "source": detect_source(prompt),
+        "length": len(response.split()),
+        "use_rag": use_rag,
+        "action_tag": action_tag,
+        # Métricas reportadas por el propio servidor Ollama
+        "time_to_first_token": round(stats.time_to_first_token, 3) if stats else None,
+        "tokens_per_second": round(stats.tokens_per_second, 2) if stats else None
+    }
+
+
+class RAGBatchRun:
+    """
+    Ejecución en segundo plano de una batería de consultas: primero se construyen los prompts
+    (recuperación y fallback) y después se generan en paralelo (hasta `max_concurrency` a la vez).
+    `cancel()` detiene la fase en curso, p. ej. cuando el usuario abandona la página del simulador.
+    `get_engine` devuelve el RAGEngine a usar (p. ej. el compartido de la página de conocimiento);
+    por defecto se crea uno nuevo.
+    """
+
+    def __init__(self, queries, model, use_rag=True, max_concurrency=4, get_engine=None):
+        self.queries = list(queries)
+        self.get_engine = get_engine or (lambda: RAGEngine(config))
+        self.model = model
+        self.use_rag = use_rag
+        self.max_concurrency = max_concurrency
+        self.total = len(self.queries)
+        self.prepared = 0
+        self.completed = 0
+        self._client = None
+        self._cancelled = threading.Event()
+        self._thread = None
+        self._results = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rag-batch", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def progress(self):
+        """Fracción completada: cada consulta cuenta una vez al construir su prompt y otra al generarse."""
+        return (self.prepared + self.completed) / max(2 * self.total, 1)
+
+    def done(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def cancel(self):
+        self._cancelled.set()
+        client = self._client
+        if client is not None:
+            client.cancel()
+
+    def result(self, timeout=None):
+        self._thread.join(timeout)
+        return self._results
+
+    def _on_result(self, index, outcome):
+        self.completed += 1
+
+    def _run(self):
+        try:
+            self._results = self._simulate()
+        except Exception as e:
+            self._results = [connection_error_result(query, e, self.use_rag) for query in self.queries]
+
+    def _simulate(self):
+        try:
+            engine = self.get_engine().with_rag(self.use_rag)
+        except (requests.exceptions.ConnectionError, OSError) as e:
+            return [connection_error_result(query, e, self.use_rag) for query in self.queries]
+
+        if self.use_rag:
+            # Preprocesa todas las consultas en un lote de spaCy; build_prompt las toma de la caché
+            engine.ontology_retriever.retrieve_batch(self.queries)
+        prompts = []
+        for query in self.queries:
+            if self._cancelled.is_set():
+                return [cancelled_result(q, self.use_rag) for q in self.queries]
+            prompts.append(engine.build_prompt(query, []))
+            self.prepared += 1
+
+        async def run():
+            async with AsyncOllamaClient(max_concurrency=self.max_concurrency) as client:
+                self._client = client
+                if self._cancelled.is_set():
+                    return [asyncio.CancelledError() for _ in prompts]
+                return await client.generate_many(
+                    self.model,
+                    prompts,
+                    temperature=config["llm"]["temperature"],
+                    max_tokens=config["llm"]["max_tokens"],
+                    on_result=self._on_result,
+                )
+
+        results = []
+        for query, prompt, outcome in zip(self.queries, prompts, asyncio.run(run())):
+            if isinstance(outcome, asyncio.CancelledError):
+                results.append(cancelled_result(query, self.use_rag))
+            elif isinstance(outcome, BaseException):
+                results.append(connection_error_result(query, outcome, self.use_rag))
+            else:
+                results.append(generation_result(query, prompt, outcome, outcome.latency, self.use_rag))
+        return results
+
+
+def cancelled_result(query, use_rag=True, action_tag=None):
+    return {
+        **connection_error_result(query, "cancelled", use_rag, action_tag),
+        "response": "Cancelled",
+        "source": "Cancelled",
+    }
+
+
+def simulate_rag_batch(queries, model, use_rag=True, max_concurrency=4, get_engine=None):
+    """Simula una lista de consultas y devuelve sus resultados (bloquea hasta terminar)."""
+    return RAGBatchRun(queries, model, use_rag, max_concurrency, get_engine).start().result()
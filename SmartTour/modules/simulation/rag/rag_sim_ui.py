@@ -1,9 +1,11 @@
 import streamlit as st
-from .rag_sim import simulate_rag_interaction
+from .rag_sim import RAGBatchRun
+from ...knowledge import get_engine
 from .mock_queries import queries
 import pandas as pd
 import io
 import json
+import time
 
 def render_rag_simulator():
     st.title("📚 RAG Chatbot Simulation")
@@ -11,15 +13,27 @@ def render_rag_simulator():
     selected_model = st.selectbox("Select model", [ "openhermes", "gemma2"])
     use_rag = st.checkbox("Use RAG (Retrieve from KB)", value=True)
     show_details = st.checkbox("Show individual responses", value=True)
+    max_concurrency = st.slider("Concurrent generations", 1, 8, 4)
 
     results = []
     connection_error = False  # Track if any connection error occurs
     if st.button("▶️ Run Simulation"):
-        for query in queries:
-            result = simulate_rag_interaction(query, model=selected_model, use_rag=use_rag)
-            if result.get("source") == "ConnectionError":
-                connection_error = True
-            results.append(result)
+        run = RAGBatchRun(
+            queries, model=selected_model, use_rag=use_rag, max_concurrency=max_concurrency, get_engine=get_engine
+        ).start()
+        progress = st.progress(0.0)
+        try:
+            while not run.done():
+                progress.progress(run.progress)
+                time.sleep(0.2)
+        finally:
+            # Si el usuario cambia de página o relanza el script, Streamlit interrumpe el bucle:
+            # se cancelan las generaciones que sigan en curso
+            if not run.done():
+                run.cancel()
+        results = run.result()
+        progress.empty()
+        connection_error = any(r.get("source") == "ConnectionError" for r in results)
 
         if connection_error:
             st.error("❌ Connection error: Unable to reach HuggingFace or required model. Please check your internet connection or try again later.")
@@ -4,6 +4,7 @@ import json
 import re
 from jsonschema import validate, ValidationError
 from ..rag.app.ollama_interface import OllamaClient
+from ..rag.app.llm_cache import LLMCache
 import streamlit as st
 
 ollama_client = OllamaClient()
@@ -29,33 +30,37 @@ data_schema = {
     "required": REQUIRED_FIELDS
 }
 
-def ask_ollama(messages, model=OLLAMA_MODEL):
+@st.cache_resource
+def get_llm_cache():
+    # Respuestas a prompts plantilla (iguales para todos los usuarios) persistidas entre sesiones;
+    # la base SQLite se abre al primer uso, no al importar el módulo
+    return LLMCache()
+
+def ask_ollama_stream(messages, model=OLLAMA_MODEL, cache=False):
+    """
+    Devuelve un iterador con los fragmentos de la respuesta a medida que llegan.
+    cache=True solo para prompts que no contienen datos del usuario: la respuesta se reutiliza
+    para cualquier usuario que envíe el mismo prompt al mismo modelo.
+    """
     if not messages or messages[-1]["role"] != "user":
         raise ValueError("El último mensaje debe ser del usuario.")
     prompt = messages[0]["content"]
-    response = ""
-    for chunk in ollama_client.stream_generate(model, prompt):
-        try:
-            # Intenta decodificar cada chunk como JSON
-            data = json.loads(chunk)
-            # Solo toma el contenido del campo 'response' si existe y no está vacío
-            text = data.get("response", "")
-            if text:
-                response += text
-            # Si el chunk indica que terminó, rompe el ciclo
-            if data.get("done", False):
-                break
-        except Exception:
-            # Si no es JSON, asume que es texto plano y lo agrega
-            response += chunk
-    return response.strip()
+    if cache:
+        return get_llm_cache().stream(ollama_client, model, prompt)
+    return ollama_client.stream_generate(model, prompt)
 
-def generate_prompt(field, language, model):
+def ask_ollama(messages, model=OLLAMA_MODEL, cache=False):
+    return "".join(ask_ollama_stream(messages, model, cache)).strip()
+
+def generate_prompt_stream(field, language, model):
     prompt = f"Generate a polite and natural question in {language} to ask the user about their {field}. Return only one question."
-    return ask_ollama([
+    return ask_ollama_stream([
         {"role": "system", "content": prompt},
         {"role": "user", "content": ""}
-    ], model)
+    ], model, cache=True)
+
+def generate_prompt(field, language, model):
+    return "".join(generate_prompt_stream(field, language, model)).strip()
 
 def extract_json(response):
     try:
@@ -93,8 +98,11 @@ def extract_field(field, user_input, language, model):
     if response.strip() == "No pude encontrar nada":
         return None
     
+    return validate_field(field, response.strip())
+
+def validate_field(field, value):
+    """Convierte el valor al tipo del esquema y lo valida; None si no es válido."""
     schema = data_schema["properties"][field]
-    value = response.strip()
 
     # Try to cast to the correct type based on the schema
     try:
@@ -103,7 +111,9 @@ def extract_field(field, user_input, language, model):
             if "minimum" in schema and value < schema["minimum"]:
                 return None
         elif schema["type"] == "string":
-            value = str(value)
+            value = str(value).strip()
+            if not value:
+                return None
         else:
             return None
     except Exception:
@@ -117,24 +127,87 @@ def extract_field(field, user_input, language, model):
         return None
     return value
 
-def translate(text, language, model):
+def extract_fields(user_input, fields, language, model, current_field=None):
+    """
+    Extrae en una sola llamada (modo JSON de Ollama) todos los campos de `fields` presentes
+    en el mensaje del usuario. Devuelve {campo: valor} solo con los valores válidos según data_schema.
+    """
+    field_types = ", ".join(f"{f} ({data_schema['properties'][f]['type']})" for f in fields)
+    prompt = (
+        f"The user wrote: '{user_input}'. "
+        + (f"They were answering a question about '{current_field}'. " if current_field else "")
+        + f"Extract the values for these fields if the user mentions them: {field_types}. "
+        f"Respond ONLY with a JSON object whose keys are the fields found; omit fields that are not mentioned. "
+        f"Write string values in {language}."
+    )
+    response = ollama_client.generate(model, prompt, temperature=0, format="json").text
+    try:
+        parsed = json.loads(response)
+    except ValueError:
+        parsed = extract_json(response)
+    if not isinstance(parsed, dict):
+        return {}
+
+    values = {}
+    for field in fields:
+        value = parsed.get(field)
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if value in (None, ""):
+            continue
+        value = validate_field(field, value)
+        if value is not None:
+            values[field] = value
+    return values
+
+def first_missing_step(collected_data):
+    for i, field in enumerate(REQUIRED_FIELDS):
+        if field not in collected_data:
+            return i
+    return len(REQUIRED_FIELDS)
+
+def translate_stream(text, language, model):
     if language.lower() == "english":
-        return text.strip()
+        return iter([text.strip()])
     prompt = f"Translate this to {language}: {text}, only return the translated question"
-    response = ask_ollama([
+    return ask_ollama_stream([
         {"role": "user", "content": prompt}
-    ], model)
-    # Busca y devuelve solo el valor de la variable response (sin procesar JSON ni líneas)
-    return response.strip()
+    ], model, cache=True)
+
+def translate(text, language, model):
+    return "".join(translate_stream(text, language, model)).strip()
 
 def initialize_conversation(language, model):
     return [{"role": "system", "content": f"You are a friendly assistant that helps users plan travel in {language}."}]
 
-def chatbot_conversation(user_input, conversation_history, collected_data, language, model):
+def chatbot_conversation(user_input, conversation_history, collected_data, language, model, structured=True):
+    return "".join(chatbot_conversation_stream(
+        user_input, conversation_history, collected_data, language, model, structured
+    )).strip()
+
+def chatbot_conversation_stream(user_input, conversation_history, collected_data, language, model, structured=True):
+    """
+    Procesa el turno (extracción y validación de los campos, actualización de collected_data) antes de
+    devolver, y devuelve un iterador con los fragmentos de la respuesta para mostrarlos según llegan.
+    structured=True: una sola llamada extrae todos los campos que el usuario mencione (puede saltar pasos).
+    structured=False: un campo por turno con extract_field.
+    """
     if "step" not in collected_data:
         collected_data["step"] = 0
 
     current_step = collected_data["step"]
+    if structured and current_step < len(REQUIRED_FIELDS):
+        field = REQUIRED_FIELDS[current_step]
+        missing = [f for f in REQUIRED_FIELDS if f not in collected_data]
+        values = extract_fields(user_input, missing, language, model, current_field=field)
+        if not values:
+            return translate_stream(f"I couldn't understand your answer for '{field}'. Could you try again, please?", language, model)
+        collected_data.update(values)
+        collected_data["step"] = first_missing_step(collected_data)
+        if collected_data["step"] < len(REQUIRED_FIELDS):
+            return generate_prompt_stream(REQUIRED_FIELDS[collected_data["step"]], language, model)
+        return translate_stream("Thank you! I’ve collected all your travel preferences. You can now edit any field by typing its name followed by the new value.", language, model)
+
     if current_step < len(REQUIRED_FIELDS):
         field = REQUIRED_FIELDS[current_step]
         value = extract_field(field, user_input, language, model)
@@ -143,13 +216,11 @@ def chatbot_conversation(user_input, conversation_history, collected_data, langu
             collected_data["step"] += 1
             if collected_data["step"] < len(REQUIRED_FIELDS):
                 next_field = REQUIRED_FIELDS[collected_data["step"]]
-                question = generate_prompt(next_field, language, model)
-                return question
+                return generate_prompt_stream(next_field, language, model)
             else:
-                return translate("Thank you! I’ve collected all your travel preferences. You can now edit any field by typing its name followed by the new value.", language, model)
+                return translate_stream("Thank you! I’ve collected all your travel preferences. You can now edit any field by typing its name followed by the new value.", language, model)
         else:
-            retry = translate(f"I couldn't understand your answer for '{field}'. Could you try again, please?", language, model)
-            return retry
+            return translate_stream(f"I couldn't understand your answer for '{field}'. Could you try again, please?", language, model)
 
     # Ya se recogieron todos los datos: verificar si es una edición
     user_input_lower = user_input.lower()
@@ -158,8 +229,8 @@ def chatbot_conversation(user_input, conversation_history, collected_data, langu
             value = extract_field(field, user_input, language, model)
             if value is not None:
                 collected_data[field] = value
-                return translate(f"Updated '{field}' successfully.", language, model)
+                return translate_stream(f"Updated '{field}' successfully.", language, model)
             else:
-                return translate(f"Sorry, I couldn't update '{field}' with that input. Please try again.", language, model)
+                return translate_stream(f"Sorry, I couldn't update '{field}' with that input. Please try again.", language, model)
 
-    return translate("You’ve already completed the form. To update any field, type its name followed by the new value.", language, model)
+    return translate_stream("You’ve already completed the form. To update any field, type its name followed by the new value.", language, model)
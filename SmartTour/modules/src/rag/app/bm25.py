@@ -0,0 +1,98 @@
+import hashlib
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from .cache import dump_pickle, load_pickle
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Minúsculas, sin tildes y separado en palabras (así "Viñales" y "vinales" coinciden)."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def corpus_fingerprint(texts):
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """Índice invertido BM25 (Okapi) construido una vez y persistido en disco."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.idf = {}
+        self.doc_lengths = []
+        self.avgdl = 0.0
+        self.fingerprint = None
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        index = cls(k1, b)
+        index.add_documents(texts)
+        index.fingerprint = corpus_fingerprint(texts)
+        return index
+
+    def add_documents(self, texts):
+        """Añade documentos al final del índice (sus posiciones continúan la numeración)."""
+        for text in texts:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+        n_docs = len(self.doc_lengths)
+        self.avgdl = sum(self.doc_lengths) / n_docs if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    @classmethod
+    def load_or_build(cls, path, texts):
+        """Carga el índice persistido si corresponde al mismo corpus; si no, lo reconstruye."""
+        fingerprint = corpus_fingerprint(texts)
+        # Un archivo corrupto o de otra versión se trata como ausente y se reconstruye
+        index = load_pickle(path) if path else None
+        if isinstance(index, cls) and index.fingerprint == fingerprint:
+            return index
+        index = cls.build(texts)
+        if path:
+            index.save(path)
+        return index
+
+    def save(self, path):
+        dump_pickle(self, path)
+
+    def search(self, query, k=10):
+        """Devuelve [(posición, puntuación)] de los k documentos con mayor puntuación BM25."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for doc_id, tf in self.postings.get(term, ()):
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.doc_lengths[doc_id] / self.avgdl
+                )
+                scores[doc_id] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda x: -x[1])[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fusiona varias listas ordenadas de identificadores por Reciprocal Rank Fusion.
+    Cada aparición aporta 1 / (k + rango); devuelve los identificadores de mayor a menor puntuación.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
@@ -0,0 +1,120 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Errores de un pickle truncado, corrupto o de una versión anterior de las clases
+PICKLE_ERRORS = (OSError, pickle.UnpicklingError, EOFError, AttributeError)
+
+
+def dump_pickle(obj, path):
+    """
+    Guarda `obj` en un temporal propio del mismo directorio y lo renombra sobre `path`:
+    un corte o dos escritores a la vez nunca dejan un archivo a medias.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_pickle(path, default=None):
+    """Carga un pickle; devuelve `default` si no existe o no se puede leer."""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except PICKLE_ERRORS:
+        return default
+
+
+class LRUCache:
+    """
+    Caché LRU acotada y segura entre hilos, con caducidad opcional (ttl en segundos).
+    Lleva la cuenta de aciertos y fallos para poder medir su efectividad.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def save(self, path):
+        """Guarda en disco las entradas vigentes (con su caducidad) para recuperarlas al reiniciar."""
+        now = time.time()
+        with self._lock:
+            entries = [
+                (key, value, expires)
+                for key, (value, expires) in self._data.items()
+                if expires is None or expires > now
+            ]
+        dump_pickle(entries, path)
+
+    def load(self, path):
+        """Carga las entradas guardadas con save() que no hayan caducado; devuelve cuántas cargó."""
+        entries = load_pickle(path, [])
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, value, expires in entries:
+                if expires is None or expires > now:
+                    self._data[key] = (value, expires)
+                    self._data.move_to_end(key)
+                    loaded += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return loaded
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,42 @@
+import re
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def chunk_text(text, chunk_size=200, overlap=40):
+    """
+    Divide un texto en pasajes de `chunk_size` palabras que se solapan en `overlap` palabras.
+    Devuelve una lista de tuplas (inicio, fin, texto) con los offsets de caracteres en el texto original.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser mayor que 0.")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap debe estar entre 0 y chunk_size - 1.")
+
+    words = [m.span() for m in _WORD_RE.finditer(text or "")]
+    if not words:
+        return []
+
+    chunks = []
+    stride = chunk_size - overlap
+    for first in range(0, len(words), stride):
+        last = min(first + chunk_size, len(words)) - 1
+        start, end = words[first][0], words[last][1]
+        chunks.append((start, end, text[start:end]))
+        if last == len(words) - 1:
+            break
+    return chunks
+
+
+def chunk_documents(documents, chunk_size=200, overlap=40):
+    """
+    Genera los pasajes de una lista de documentos ({"content": ...}).
+    Cada pasaje guarda el índice del documento de origen y sus offsets dentro de `content`.
+    """
+    passages = []
+    for doc_id, doc in enumerate(documents):
+        for start, end, text in chunk_text(doc.get("content", ""), chunk_size, overlap):
+            passages.append(
+                {"doc_id": doc_id, "start": start, "end": end, "text": text}
+            )
+    return passages
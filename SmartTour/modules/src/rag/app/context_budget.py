@@ -0,0 +1,94 @@
+import math
+import re
+
+from .bm25 import reciprocal_rank_fusion, tokenize
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def approx_token_count(text):
+    """
+    Aproximación al número de tokens de un modelo BPE: palabras y signos de puntuación,
+    con un 30 % extra por las palabras que el tokenizador parte en varios trozos.
+    """
+    return math.ceil(len(_PIECE_RE.findall(text)) * 1.3)
+
+
+def truncate_to_tokens(text, max_tokens, count_tokens=approx_token_count):
+    """Recorta `text` por palabras hasta que quepa en `max_tokens`."""
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+class ContextAssembler:
+    """
+    Construye el contexto del prompt a partir de varias listas de fragmentos ya ordenadas por relevancia
+    (documentos, ontología, fallback...) sin pasar de `max_tokens`.
+    Los fragmentos se fusionan por Reciprocal Rank Fusion, se eliminan duplicados y se añaden
+    en orden mientras quepan. `count_tokens` puede sustituirse por el tokenizador real del modelo.
+    """
+
+    def __init__(
+        self, max_tokens=1024, count_tokens=approx_token_count, separator="\n"
+    ):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self.separator = separator
+
+    def assemble(self, rankings):
+        """Devuelve (contexto, estadísticas) con los tokens usados y descartados."""
+        keyed_rankings = [
+            [str(text).strip() for text in ranking if str(text).strip()]
+            for ranking in rankings
+        ]
+
+        stats = {
+            "used_tokens": 0,
+            "dropped_tokens": 0,
+            "used": 0,
+            "dropped": 0,
+            "duplicates": 0,
+        }
+        selected = []
+        seen = []
+        separator_tokens = (
+            self.count_tokens(self.separator) if self.separator.strip() else 0
+        )
+        for text in reciprocal_rank_fusion(keyed_rankings):
+            # Duplicado si sus palabras aparecen seguidas en un fragmento ya elegido
+            # (comparando palabras completas: "Cuba" no es duplicado de "Los cubanos...")
+            normalized = " " + " ".join(tokenize(text)) + " "
+            if any(normalized in other for other in seen):
+                stats["duplicates"] += 1
+                continue
+            seen.append(normalized)
+
+            tokens = self.count_tokens(text)
+            cost = tokens + (separator_tokens if selected else 0)
+            if stats["used_tokens"] + cost > self.max_tokens:
+                if not selected:
+                    # El fragmento más relevante no cabe entero: se recorta en vez de dejar el contexto vacío
+                    text = truncate_to_tokens(text, self.max_tokens, self.count_tokens)
+                    kept = self.count_tokens(text) if text else 0
+                    if text:
+                        selected.append(text)
+                        stats["used"] += 1
+                        stats["used_tokens"] += kept
+                    else:
+                        stats["dropped"] += 1
+                    stats["dropped_tokens"] += tokens - kept
+                else:
+                    stats["dropped"] += 1
+                    stats["dropped_tokens"] += tokens
+                continue
+            selected.append(text)
+            stats["used"] += 1
+            stats["used_tokens"] += cost
+        return self.separator.join(selected), stats
@@ -0,0 +1,34 @@
+from functools import lru_cache
+from sentence_transformers import SentenceTransformer
+from .cache import LRUCache
+
+# Caché de embeddings de consultas compartida por todos los recuperadores del proceso
+query_embedding_cache = LRUCache(maxsize=2048)
+
+
+@lru_cache(maxsize=None)
+def get_embedder(model_name):
+    """Carga cada modelo de embeddings una sola vez por proceso."""
+    return SentenceTransformer(model_name)
+
+
+def normalize_query(text):
+    return " ".join(str(text).split())
+
+
+def encode_query(model_name, text):
+    """
+    Devuelve el embedding de una consulta usando la caché LRU compartida.
+    La clave es (modelo, texto normalizado); el array devuelto es de solo lectura.
+    """
+    key = (model_name, normalize_query(text))
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedder(model_name).encode(key[1])
+        embedding.setflags(write=False)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+def query_cache_stats():
+    return query_embedding_cache.stats()
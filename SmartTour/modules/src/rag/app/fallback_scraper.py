@@ -1,10 +1,37 @@
 import wikipedia
 import re
+import random
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from urllib.parse import quote
 from fake_useragent import UserAgent
 
+DUCKDUCKGO_URL = "https://html.duckduckgo.com/html/"
+
+def new_session():
+    """Sesión HTTP con conexiones keep-alive reutilizables entre hilos (la crea y guarda quien la usa)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_user_agents = None
+_user_agents_lock = threading.Lock()
+
+def random_user_agent():
+    """User-Agent aleatorio de un pool creado una sola vez por proceso (UserAgent() es lento)."""
+    global _user_agents
+    with _user_agents_lock:
+        if _user_agents is None:
+            ua = UserAgent()
+            _user_agents = list({ua.random for _ in range(20)})
+    return random.choice(_user_agents)
+
 def clean_text(text):
     # Elimina corchetes de referencias [1], [2], etc.
     text = re.sub(r"\[\d+\]", "", text)
@@ -12,13 +39,13 @@ def clean_text(text):
     text = re.sub(r"\s+", " ", text)
     return text.strip()
 
-def extract_main_content(url, headers=None):
+def extract_main_content(url, session, cache, headers=None, timeout=10):
     try:
-        response = requests.get(url, headers=headers or {}, timeout=10)
-        if response.status_code != 200:
+        status, html = cache.fetch(session, url, headers, timeout)
+        if status != 200:
             return None
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
         # Busca el contenido principal en los párrafos
         paragraphs = soup.find_all("p")
         # Extrae los primeros 2-3 párrafos útiles
@@ -29,11 +56,16 @@ def extract_main_content(url, headers=None):
         print(f"[ContentExtractor] ❌ Error al procesar {url}: {e}")
         return None
 
-def search_wikipedia(query, lang="es"):
+def search_wikipedia(query, cache, lang="es"):
     """
     Busca la entrada más relevante en Wikipedia y extrae su introducción.
     Si hay ambigüedad o desambiguación, elige el primer resultado posible.
     """
+    cache_key = f"wikipedia:{lang}:{query.strip().lower()}"
+    cached = cache.get_result(cache_key)
+    if cached:
+        return cached
+
     try:
         wikipedia.set_lang(lang)
         results = wikipedia.search(query)
@@ -45,13 +77,16 @@ def search_wikipedia(query, lang="es"):
             try:
                 page = wikipedia.page(title, auto_suggest=False)
                 # Usamos solo la parte introductoria del contenido
-                summary = page.summary
-                return clean_text(summary)
+                summary = clean_text(page.summary)
+                cache.set_result(cache_key, summary)
+                return summary
             except wikipedia.exceptions.DisambiguationError as e:
                 # Elegimos la primera opción sugerida de la página de desambiguación
                 try:
                     sub_page = wikipedia.page(e.options[0], auto_suggest=False)
-                    return clean_text(sub_page.summary)
+                    summary = clean_text(sub_page.summary)
+                    cache.set_result(cache_key, summary)
+                    return summary
                 except:
                     continue
             except Exception:
@@ -62,22 +97,17 @@ def search_wikipedia(query, lang="es"):
 
     return None
 
-def search_duckduckgo_top3(query, lang="es"):
+def search_duckduckgo_links(query, session, cache, headers=None, search_url=DUCKDUCKGO_URL, timeout=10, n=3):
     """
-    Busca la query en DuckDuckGo y devuelve el contenido principal de los 3 primeros resultados.
+    Busca la query en DuckDuckGo y devuelve los enlaces de los n primeros resultados.
     """
-    headers = {
-        "User-Agent": UserAgent().random
-    }
-
-    search_url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
     try:
-        resp = requests.get(search_url, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            print(f"[DuckDuckGo] ❌ Error en búsqueda: {resp.status_code}")
+        status, html = cache.fetch(session, f"{search_url}?q={quote(query)}", headers, timeout)
+        if status != 200:
+            print(f"[DuckDuckGo] ❌ Error en búsqueda: {status}")
             return []
 
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
         results = soup.select(".result__a")
 
         if not results:
@@ -85,37 +115,63 @@ def search_duckduckgo_top3(query, lang="es"):
             return []
 
         top_links = []
-        for link in results[:3]:
+        for link in results[:n]:
             href = link.get("href")
             if not href.startswith("http"):
                 href = "https:" + href
             top_links.append(href)
-
-        # Extrae el contenido principal de cada enlace
-        contents = []
-        for url in top_links:
-            content = extract_main_content(url, headers)
-            if content:
-                contents.append(content)
-        return contents
+        return top_links
 
     except Exception as e:
         print(f"[DuckDuckGo] ❌ Error general: {e}")
         return []
 
-def search_dynamic(query, lang="es"):
+def _result(future):
+    """Resultado de un future terminado, o None si falló o no terminó a tiempo."""
+    if not future.done() or future.cancelled() or future.exception() is not None:
+        return None
+    return future.result()
+
+def search_dynamic(query, session, cache, lang="es", deadline=15.0, search_url=DUCKDUCKGO_URL):
     """
     Devuelve una lista con el resultado más importante de Wikipedia y los 3 más importantes de DuckDuckGo.
+    `session` (ver new_session) y `cache` (HTTPCache) son del llamador, que los reutiliza entre consultas.
+    Wikipedia y DuckDuckGo se consultan a la vez y las páginas de resultados se descargan en paralelo;
+    pasados `deadline` segundos se devuelve lo que haya terminado.
     """
-    results = []
-    # Wikipedia (solo el más relevante)
-    wiki_result = search_wikipedia(query, lang)
-    if wiki_result:
-        results.append({"source": "wikipedia", "content": wiki_result})
-
-    # DuckDuckGo (top 3)
-    duck_results = search_duckduckgo_top3(query, lang)
-    for idx, content in enumerate(duck_results):
-        results.append({"source": f"duckduckgo_{idx+1}", "content": content})
-
-    return results
+    start = time.monotonic()
+
+    def remaining():
+        return max(0.0, deadline - (time.monotonic() - start))
+
+    headers = {
+        "User-Agent": random_user_agent()
+    }
+    pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="fallback")
+    try:
+        wiki_future = pool.submit(search_wikipedia, query, cache, lang)
+        links_future = pool.submit(
+            search_duckduckgo_links, query, session, cache, headers, search_url, min(10, deadline)
+        )
+        wait([links_future], timeout=remaining())
+        page_futures = [
+            pool.submit(extract_main_content, url, session, cache, headers, max(0.1, min(10, remaining())))
+            for url in (_result(links_future) or [])
+        ]
+        wait([wiki_future, *page_futures], timeout=remaining())
+
+        results = []
+        # Wikipedia (solo el más relevante)
+        wiki_result = _result(wiki_future)
+        if wiki_result:
+            results.append({"source": "wikipedia", "content": wiki_result})
+
+        # DuckDuckGo (top 3, los que terminaron a tiempo)
+        duck_results = [content for content in map(_result, page_futures) if content]
+        for idx, content in enumerate(duck_results):
+            results.append({"source": f"duckduckgo_{idx+1}", "content": content})
+
+        return results
+    finally:
+        # Lo que no terminó a tiempo no bloquea el turno del chat
+        pool.shutdown(wait=False, cancel_futures=True)
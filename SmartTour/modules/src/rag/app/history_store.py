@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from .vector_index import VectorIndex
+
+
+class HistoryStore:
+    """
+    Historial de chat de una sesión con un índice coseno que crece con cada turno.
+    Cada turno se codifica una sola vez, al añadirse; las consultas son un único producto matriz-vector.
+    """
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.turns = []
+        self.index = None
+        # Las etapas de build_prompt se ejecutan en hilos del pool: una sola escritura a la vez por sesión
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def extend(self, turns):
+        turns = list(turns)
+        if not turns:
+            return
+        with self._lock:
+            embeddings = self.embedder.encode(
+                [turn.get("content", "") for turn in turns]
+            )
+            if self.index is None:
+                self.index = VectorIndex(embeddings.shape[1])
+            self.index.add(embeddings)
+            self.turns.extend(turns)
+
+    def append(self, turn):
+        self.extend([turn])
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self.index = None
+
+    def sync(self, chat_history):
+        """Añade solo los turnos de `chat_history` que aún no están indexados."""
+        with self._lock:
+            n = len(self.turns)
+            if len(chat_history) < n or (
+                n
+                and chat_history[n - 1].get("content", "")
+                != self.turns[-1].get("content", "")
+            ):
+                # El historial se reinició o cambió: se vuelve a indexar
+                self.clear()
+                n = 0
+            self.extend(chat_history[n:])
+
+    def most_relevant(self, query_embedding, k=10):
+        """Devuelve los k turnos más parecidos a la consulta, del más al menos relevante."""
+        with self._lock:
+            if not self.turns:
+                return []
+            _, ids = self.index.search(query_embedding, k)
+            return [self.turns[i] for i in ids[0] if i != -1]
+
+
+class SessionHistories:
+    """
+    Historiales indexados por sesión. Las sesiones que se cierran sin pulsar "Limpiar" se liberan
+    tras `session_ttl` segundos sin uso, o las menos recientes al pasar de `max_sessions`.
+    """
+
+    def __init__(self, embedder, max_sessions=256, session_ttl=2 * 3600):
+        self.embedder = embedder
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        # session_id -> (HistoryStore, último acceso), del menos al más reciente
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stores)
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._stores.pop(session_id, None)
+            store = entry[0] if entry else HistoryStore(self.embedder)
+            self._stores[session_id] = (store, now)
+            while (
+                len(self._stores) > self.max_sessions
+                or now - next(iter(self._stores.values()))[1] > self.session_ttl
+            ):
+                self._stores.popitem(last=False)
+            return store
+
+    def evict(self, session_id):
+        """Libera el historial indexado de una sesión terminada."""
+        with self._lock:
+            self._stores.pop(session_id, None)
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class HTTPCache:
+    """
+    Caché persistente (SQLite) de respuestas HTTP para el scraping de fallback.
+    - Cada URL guarda su ETag / Last-Modified y se revalida con peticiones condicionales al caducar el TTL.
+    - Los cuerpos se guardan por hash de contenido, así que páginas idénticas ocupan una sola vez.
+    - También guarda resultados ya procesados (p. ej. el resumen de Wikipedia de una consulta).
+    - Las entradas caducadas se purgan al abrirla y cada `purge_every` escrituras.
+    """
+
+    def __init__(
+        self,
+        path="modules/src/rag/data/http_cache.sqlite",
+        ttl=7 * 24 * 3600,
+        purge_every=500,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL,
+                    body_hash TEXT
+                );
+                CREATE TABLE IF NOT EXISTS bodies (
+                    hash TEXT PRIMARY KEY,
+                    body TEXT
+                );
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    fetched_at REAL
+                );
+                """)
+        self.purge_expired()
+
+    def _written(self):
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def _lookup(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT r.etag, r.last_modified, r.fetched_at, b.body FROM responses r "
+                "JOIN bodies b ON b.hash = r.body_hash WHERE r.url = ?",
+                (url,),
+            ).fetchone()
+
+    def _store(self, url, body, etag, last_modified):
+        body_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO bodies VALUES (?, ?)", (body_hash, body)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, time.time(), body_hash),
+            )
+        self._written()
+
+    def _touch(self, url):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def fetch(self, session, url, headers=None, timeout=10):
+        """
+        GET con caché. Devuelve (status_code, texto); el texto es None si la respuesta no es 200.
+        """
+        cached = self._lookup(url)
+        if cached and time.time() - cached[2] < self.ttl:
+            return 200, cached[3]
+
+        headers = dict(headers or {})
+        if cached:
+            # Revalidación condicional: si no cambió, el servidor responde 304 sin cuerpo
+            if cached[0]:
+                headers["If-None-Match"] = cached[0]
+            if cached[1]:
+                headers["If-Modified-Since"] = cached[1]
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached:
+            self._touch(url)
+            return 200, cached[3]
+        if response.status_code != 200:
+            return response.status_code, None
+        self._store(
+            url,
+            response.text,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        return 200, response.text
+
+    def get_result(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, fetched_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            return json.loads(row[0])
+        return None
+
+    def set_result(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+        self._written()
+
+    def purge_expired(self):
+        """Elimina entradas caducadas y cuerpos que ya no referencia ninguna URL."""
+        limit = time.time() - self.ttl
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE fetched_at < ?", (limit,))
+            self._conn.execute("DELETE FROM results WHERE fetched_at < ?", (limit,))
+            self._conn.execute(
+                "DELETE FROM bodies WHERE hash NOT IN (SELECT body_hash FROM responses)"
+            )
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def completion_key(model, prompt, temperature, max_tokens):
+    raw = json.dumps([model, prompt, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Caché persistente (SQLite) prompt -> respuesta para prompts plantilla que no dependen del usuario
+    (preguntas del formulario, traducciones de mensajes fijos...).
+    La clave es (modelo, prompt, temperature, max_tokens); al superar `max_entries` se expulsan
+    las entradas usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, path="modules/src/rag/data/llm_cache.sqlite", max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    completion TEXT,
+                    last_used REAL
+                )
+                """)
+
+    def get(self, model, prompt, temperature, max_tokens):
+        key = completion_key(model, prompt, temperature, max_tokens)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT completion FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            return row[0]
+
+    def set(self, model, prompt, temperature, max_tokens, completion):
+        key = completion_key(model, prompt, temperature, max_tokens)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, model, completion, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def generate(self, client, model, prompt, temperature=0.7, max_tokens=512):
+        """Devuelve la respuesta cacheada o la genera con `client` y la guarda (solo si no hubo error)."""
+        completion = self.get(model, prompt, temperature, max_tokens)
+        if completion is not None:
+            return completion
+        generation = client.generate(model, prompt, temperature, max_tokens)
+        if generation.error is None and generation.text.strip():
+            self.set(model, prompt, temperature, max_tokens, generation.text)
+        return generation.text
+
+    def stream(self, client, model, prompt, temperature=0.7, max_tokens=512):
+        """Como generate, pero va devolviendo los fragmentos; un acierto de caché se entrega de una vez."""
+        completion = self.get(model, prompt, temperature, max_tokens)
+        if completion is not None:
+            yield completion
+            return
+        parts = []
+        error = None
+        for event in client.stream_events(model, prompt, temperature, max_tokens):
+            if event.error is not None:
+                error = event.error
+            if event.text:
+                parts.append(event.text)
+                yield event.text
+        completion = "".join(parts)
+        if error is None and completion.strip():
+            self.set(model, prompt, temperature, max_tokens, completion)
+
+    def clear(self, model=None):
+        with self._lock, self._conn:
+            if model is None:
+                self._conn.execute("DELETE FROM completions")
+            else:
+                self._conn.execute("DELETE FROM completions WHERE model = ?", (model,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
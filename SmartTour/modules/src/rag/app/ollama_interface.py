@@ -1,26 +1,277 @@
 import requests
 import json
+import asyncio
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # Solo necesario para AsyncOllamaClient
+    httpx = None
+
+def _new_session(retries, backoff_factor):
+    """Sesión keep-alive con reintentos ante fallos de conexión o 502/503/504."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,  # no se repite una generación que ya empezó a llegar
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class GenerationStats:
+    """Métricas que Ollama envía en el último evento del stream (duraciones en nanosegundos)."""
+
+    def __init__(self, data):
+        self.total_duration = data.get("total_duration", 0)
+        self.load_duration = data.get("load_duration", 0)
+        self.prompt_eval_count = data.get("prompt_eval_count", 0)
+        self.prompt_eval_duration = data.get("prompt_eval_duration", 0)
+        self.eval_count = data.get("eval_count", 0)
+        self.eval_duration = data.get("eval_duration", 0)
+
+    @property
+    def time_to_first_token(self):
+        """Segundos hasta el primer token: carga del modelo + evaluación del prompt."""
+        return (self.load_duration + self.prompt_eval_duration) / 1e9
+
+    @property
+    def tokens_per_second(self):
+        return self.eval_count / (self.eval_duration / 1e9) if self.eval_duration else 0.0
+
+    def as_dict(self):
+        return {
+            "prompt_tokens": self.prompt_eval_count,
+            "completion_tokens": self.eval_count,
+            "time_to_first_token": round(self.time_to_first_token, 3),
+            "tokens_per_second": round(self.tokens_per_second, 2),
+            "total_duration": round(self.total_duration / 1e9, 3),
+        }
+
+    def __repr__(self):
+        return f"GenerationStats({self.as_dict()})"
+
+class GenerationEvent:
+    """Un evento del stream: fragmento de texto y, en el último (done=True), las estadísticas."""
+
+    __slots__ = ("text", "done", "stats", "error")
+
+    def __init__(self, text="", done=False, stats=None, error=None):
+        self.text = text
+        self.done = done
+        self.stats = stats
+        self.error = error
+
+    def __repr__(self):
+        return f"GenerationEvent(text={self.text!r}, done={self.done})"
+
+class Generation:
+    """Resultado completo de una generación."""
+
+    def __init__(self, text, stats=None, error=None):
+        self.text = text
+        self.stats = stats
+        self.error = error
+        self.latency = None  # segundos de reloj, si quien generó los midió
+
+def parse_stream_line(line):
+    """Decodifica una línea NDJSON del stream de Ollama; None si no es JSON válido."""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.strip()
+    if line.startswith("data:"):
+        line = line[len("data:"):].strip()
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if "error" in data:
+        print(f"[Ollama] ❌ {data['error']}")
+        return GenerationEvent(done=True, error=data["error"])
+    done = data.get("done", False)
+    return GenerationEvent(
+        text=data.get("response", ""),
+        done=done,
+        stats=GenerationStats(data) if done else None,
+    )
+
+def _generate_payload(model, prompt, temperature, max_tokens, format=None):
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        # Ollama lee los parámetros de muestreo dentro de "options"
+        "options": {"temperature": temperature, "num_predict": max_tokens},
+        "stream": True
+    }
+    if format is not None:
+        # "json" o un JSON Schema: Ollama restringe la salida a JSON válido
+        payload["format"] = format
+    return payload
+
+def _collect(events):
+    parts = []
+    for event in events:
+        parts.append(event.text)
+        if event.done:
+            return Generation("".join(parts), event.stats, event.error)
+    return Generation("".join(parts))
+
+def _task_outcome(task):
+    """Resultado de una tarea terminada: el Generation, la excepción o CancelledError."""
+    if task.cancelled():
+        return asyncio.CancelledError()
+    return task.exception() or task.result()
 
 class OllamaClient:
-    def __init__(self, base_url="http://localhost:11434/api"):
+    def __init__(
+        self,
+        base_url="http://localhost:11434/api",
+        timeout=(3.05, 120),
+        retries=2,
+        backoff_factor=0.5,
+        models_ttl=30,
+    ):
+        """
+        - timeout: (conexión, lectura) en segundos; la lectura es el tiempo máximo entre tokens.
+        - retries/backoff_factor: reintentos con espera exponencial ante fallos de conexión o 502/503/504.
+        - models_ttl: segundos que se reutiliza la lista de modelos sin volver a pedirla.
+        """
         self.base_url = base_url
+        self.timeout = timeout
+        self.models_ttl = models_ttl
+        self.session = _new_session(retries, backoff_factor)
+        self._models = None  # (instante, lista de modelos)
 
     def list_models(self):
-        resp = requests.get(f"{self.base_url}/tags")
-        return [m["name"] for m in resp.json().get("models", [])]
-
-    def stream_generate(self, model, prompt, temperature=0.7, max_tokens=512):
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "temperature": temperature,
-            "num_predict": max_tokens,
-            "stream": True
-        }
-        response = requests.post(f"{self.base_url}/generate", json=payload, stream=True)
-        for line in response.iter_lines():
-            if line:
-                try:
-                    yield line.decode("utf-8").split("data:")[-1].strip()
-                except Exception:
+        cached = self._models
+        if cached and time.time() - cached[0] < self.models_ttl:
+            return list(cached[1])
+        resp = self.session.get(f"{self.base_url}/tags", timeout=self.timeout)
+        models = [m["name"] for m in resp.json().get("models", [])]
+        self._models = (time.time(), models)
+        return list(models)
+
+    def stream_events(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        """Genera GenerationEvent a medida que llegan las líneas NDJSON del servidor."""
+        payload = _generate_payload(model, prompt, temperature, max_tokens, format)
+        with self.session.post(
+            f"{self.base_url}/generate", json=payload, stream=True, timeout=self.timeout
+        ) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = parse_stream_line(line)
+                if event is None:
                     continue
+                yield event
+                if event.done:
+                    break
+
+    def stream_generate(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        """Genera solo los fragmentos de texto de la respuesta."""
+        for event in self.stream_events(model, prompt, temperature, max_tokens, format):
+            if event.text:
+                yield event.text
+
+    def generate(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        """Devuelve un Generation con el texto completo y las estadísticas del servidor."""
+        return _collect(self.stream_events(model, prompt, temperature, max_tokens, format))
+
+
+class AsyncOllamaClient:
+    """
+    Variante asyncio de OllamaClient para lanzar muchas generaciones a la vez (simuladores, evaluaciones).
+    Un semáforo limita las generaciones en vuelo a `max_concurrency`; cancel() aborta las pendientes.
+    """
+
+    def __init__(self, base_url="http://localhost:11434/api", max_concurrency=4, timeout=120):
+        if httpx is None:
+            raise ImportError("AsyncOllamaClient necesita httpx (pip install httpx).")
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=3.05),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._tasks = set()
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def stream_events(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        """Generador asíncrono de GenerationEvent a medida que llegan las líneas NDJSON."""
+        payload = _generate_payload(model, prompt, temperature, max_tokens, format)
+        async with self._semaphore:
+            async with self._client.stream("POST", f"{self.base_url}/generate", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = parse_stream_line(line)
+                    if event is None:
+                        continue
+                    yield event
+                    if event.done:
+                        break
+
+    async def stream_generate(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        async for event in self.stream_events(model, prompt, temperature, max_tokens, format):
+            if event.text:
+                yield event.text
+
+    async def generate(self, model, prompt, temperature=0.7, max_tokens=512, format=None):
+        """Devuelve un Generation con el texto completo y las estadísticas del servidor."""
+        return _collect([event async for event in self.stream_events(model, prompt, temperature, max_tokens, format)])
+
+    async def generate_many(self, model, prompts, temperature=0.7, max_tokens=512, on_result=None):
+        """
+        Lanza todas las generaciones a la vez (como mucho `max_concurrency` en vuelo) y devuelve
+        los Generation en el mismo orden que `prompts`; las que fallen o se cancelen devuelven la excepción.
+        on_result(índice, resultado) se llama a medida que termina cada una (para mostrar progreso).
+        """
+        self._loop = asyncio.get_running_loop()
+
+        async def timed(prompt):
+            start = time.time()
+            generation = await self.generate(model, prompt, temperature, max_tokens)
+            generation.latency = time.time() - start
+            return generation
+
+        tasks = [asyncio.create_task(timed(prompt)) for prompt in prompts]
+        if on_result is not None:
+            for i, task in enumerate(tasks):
+                task.add_done_callback(lambda t, i=i: on_result(i, _task_outcome(t)))
+        self._tasks.update(tasks)
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._tasks.difference_update(tasks)
+
+    def cancel(self):
+        """
+        Cancela las generaciones en curso (p. ej. si el usuario abandona la página).
+        Se puede llamar desde otro hilo distinto del que ejecuta el bucle de eventos.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _cancel_tasks(self):
+        for task in list(self._tasks):
+            task.cancel()
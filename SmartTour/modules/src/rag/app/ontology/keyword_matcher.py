@@ -0,0 +1,48 @@
+import re
+
+
+class KeywordMatcher:
+    """
+    Compila un diccionario {categoría: [términos]} en una sola expresión regular para detectar
+    en una pasada qué términos aparecen como subcadena del texto (mismo criterio que `term in text`).
+    El lookahead permite coincidencias solapadas; los términos que son prefijo de otro encontrado
+    en la misma posición se añaden a partir de una tabla precalculada.
+    """
+
+    def __init__(self, mapping, include_keys=True):
+        self.categories_by_term = {}
+        for category, terms in mapping.items():
+            for term in ([category] if include_keys else []) + list(terms):
+                term = term.lower()
+                self.categories_by_term.setdefault(term, [])
+                if category not in self.categories_by_term[term]:
+                    self.categories_by_term[term].append(category)
+        self.order = {category: i for i, category in enumerate(mapping)}
+
+        terms = sorted(self.categories_by_term, key=len, reverse=True)
+        self._prefixes = {
+            term: [other for other in terms if term.startswith(other)] for term in terms
+        }
+        self._pattern = (
+            re.compile("(?=(" + "|".join(re.escape(term) for term in terms) + "))")
+            if terms
+            else None
+        )
+
+    def find_terms(self, text):
+        """Conjunto de términos del diccionario contenidos en `text`."""
+        if self._pattern is None:
+            return set()
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            found.update(self._prefixes[match.group(1)])
+        return found
+
+    def find_categories(self, text):
+        """Categorías con algún término en `text`, en el orden del diccionario original."""
+        categories = {
+            category
+            for term in self.find_terms(text)
+            for category in self.categories_by_term[term]
+        }
+        return sorted(categories, key=self.order.get)
@@ -0,0 +1,41 @@
+import nltk
+
+SPACY_MODEL = "es_core_news_sm"
+# Solo se usan lemas, POS y entidades: el parser de dependencias sobra
+SPACY_DISABLED = ["parser"]
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+}
+
+
+def load_nlp():
+    """
+    Carga el pipeline de spaCy sin los componentes que no se usan (una vez por OntologyRetriever).
+    Devuelve None si el modelo no está instalado.
+    """
+    import spacy
+
+    try:
+        return spacy.load(SPACY_MODEL, disable=SPACY_DISABLED)
+    except OSError:
+        print("Modelo spaCy español no encontrado. Usando NLTK básico.")
+        return None
+
+
+def setup_nlp_resources():
+    """Descarga los recursos de NLTK y el modelo de spaCy que falten (ejecutar una vez al instalar)."""
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name)
+
+    import spacy
+
+    if not spacy.util.is_package(SPACY_MODEL):
+        spacy.cli.download(SPACY_MODEL)
+
+
+if __name__ == "__main__":
+    setup_nlp_resources()
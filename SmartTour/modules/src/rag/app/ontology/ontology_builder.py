@@ -1,7 +1,9 @@
 from rdflib import Graph, Literal, RDF, RDFS, Namespace, URIRef
 from rdflib.namespace import OWL, XSD
 import os, json
-from uuid import uuid4
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 import unicodedata
 import re
 
@@ -17,8 +19,33 @@ def clean_uri(value):
     # Si después de limpiar queda vacío, retorna None
     return value if value else None
 
+def stable_id(*values):
+    """Identificador determinista (hash del primer valor no vacío), estable entre ejecuciones."""
+    key = next((str(v) for v in values if v), "")
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def to_ntriples(triples):
+    """
+    Serializa un lote de triples como N-Triples válido.
+    `Literal.n3()` no sirve: con saltos de línea produce literales Turtle de triple comilla.
+    """
+    batch = Graph()
+    for triple in triples:
+        batch.add(triple)
+    return batch.serialize(format="nt")
+
 class OntologyBuilder:
-    def __init__(self):
+    def __init__(self, ntriples_path=None, record=False):
+        """
+        Si se indica `ntriples_path`, los triples se escriben en streaming a ese archivo N-Triples
+        en lugar de acumularse en el grafo en memoria.
+        Con `record`, el manifest guarda además los triples de cada archivo en N-Triples: son la base
+        que build_incremental() actualiza sin volver a cargar la ontología.
+        """
         self.graph = Graph()
         self.graph.bind("ex", EX)
         self.graph.bind("owl", OWL)
@@ -29,244 +56,393 @@ class OntologyBuilder:
         self.price_ranges = set()
         self.activities = set()
         self.contacts = set()
+        # Manifest de la última construcción: archivo -> hash del contenido y URI del lugar
+        self.manifest = {}
+        self.record = record
+        # Declaración (tipo y etiqueta) de cada recurso compartido creado: provincias, cocinas...
+        self.declarations = {}
+        self._declaration_nt = {}
+        self._out = open(ntriples_path, "w", encoding="utf-8") if ntriples_path else None
         self._define_schema()
 
+    def _emit(self, triples):
+        """Inserta un lote de triples en el grafo, o lo escribe en el archivo N-Triples."""
+        if self._out is not None:
+            self._out.write(to_ntriples(triples))
+        else:
+            self.graph.addN((s, p, o, self.graph) for s, p, o in triples)
+
     def _define_schema(self):
+        triples = []
         # Clases
-        self.graph.add((EX.TouristPlace, RDF.type, OWL.Class))
-        self.graph.add((EX.Province, RDF.type, OWL.Class))
-        self.graph.add((EX.CuisineType, RDF.type, OWL.Class))
-        self.graph.add((EX.PlaceType, RDF.type, OWL.Class))
-        self.graph.add((EX.PriceRange, RDF.type, OWL.Class))
-        self.graph.add((EX.Contact, RDF.type, OWL.Class))
-        self.graph.add((EX.Activity, RDF.type, OWL.Class))
+        triples.append((EX.TouristPlace, RDF.type, OWL.Class))
+        triples.append((EX.Province, RDF.type, OWL.Class))
+        triples.append((EX.CuisineType, RDF.type, OWL.Class))
+        triples.append((EX.PlaceType, RDF.type, OWL.Class))
+        triples.append((EX.PriceRange, RDF.type, OWL.Class))
+        triples.append((EX.Contact, RDF.type, OWL.Class))
+        triples.append((EX.Activity, RDF.type, OWL.Class))
         # Object properties
-        self.graph.add((EX.locatedInProvince, RDF.type, OWL.ObjectProperty))
-        self.graph.add((EX.hasCuisineType, RDF.type, OWL.ObjectProperty))
-        self.graph.add((EX.hasPlaceType, RDF.type, OWL.ObjectProperty))
-        self.graph.add((EX.hasPriceRange, RDF.type, OWL.ObjectProperty))
-        self.graph.add((EX.hasContact, RDF.type, OWL.ObjectProperty))
-        self.graph.add((EX.hasActivity, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.locatedInProvince, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.hasCuisineType, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.hasPlaceType, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.hasPriceRange, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.hasContact, RDF.type, OWL.ObjectProperty))
+        triples.append((EX.hasActivity, RDF.type, OWL.ObjectProperty))
         # Data properties
-        self.graph.add((EX.hasName, RDF.type, OWL.DatatypeProperty))
-        self.graph.add((EX.hasDescription, RDF.type, OWL.DatatypeProperty))
-        self.graph.add((EX.hasAddress, RDF.type, OWL.DatatypeProperty))
-        self.graph.add((EX.hasPhone, RDF.type, OWL.DatatypeProperty))
-        self.graph.add((EX.hasEmail, RDF.type, OWL.DatatypeProperty))
-        self.graph.add((EX.hasUrl, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasName, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasDescription, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasAddress, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasPhone, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasEmail, RDF.type, OWL.DatatypeProperty))
+        triples.append((EX.hasUrl, RDF.type, OWL.DatatypeProperty))
         # Ranges/domains (opcional, pero recomendable)
-        self.graph.add((EX.locatedInProvince, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.locatedInProvince, RDFS.range, EX.Province))
-        self.graph.add((EX.hasCuisineType, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasCuisineType, RDFS.range, EX.CuisineType))
-        self.graph.add((EX.hasPlaceType, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasPlaceType, RDFS.range, EX.PlaceType))
-        self.graph.add((EX.hasPriceRange, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasPriceRange, RDFS.range, EX.PriceRange))
-        self.graph.add((EX.hasContact, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasContact, RDFS.range, EX.Contact))
-        self.graph.add((EX.hasActivity, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasActivity, RDFS.range, EX.Activity))
-        self.graph.add((EX.hasName, RDFS.domain, OWL.Thing))
-        self.graph.add((EX.hasName, RDFS.range, XSD.string))
-        self.graph.add((EX.hasDescription, RDFS.domain, OWL.Thing))
-        self.graph.add((EX.hasDescription, RDFS.range, XSD.string))
-        self.graph.add((EX.hasAddress, RDFS.domain, OWL.Thing))
-        self.graph.add((EX.hasAddress, RDFS.range, XSD.string))
-        self.graph.add((EX.hasPhone, RDFS.domain, EX.Contact))
-        self.graph.add((EX.hasPhone, RDFS.range, XSD.string))
-        self.graph.add((EX.hasEmail, RDFS.domain, EX.Contact))
-        self.graph.add((EX.hasEmail, RDFS.range, XSD.string))
-        self.graph.add((EX.hasUrl, RDFS.domain, EX.TouristPlace))
-        self.graph.add((EX.hasUrl, RDFS.range, XSD.string))
-
-    def _get_or_create(self, name, cls, cache_set):
+        triples.append((EX.locatedInProvince, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.locatedInProvince, RDFS.range, EX.Province))
+        triples.append((EX.hasCuisineType, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasCuisineType, RDFS.range, EX.CuisineType))
+        triples.append((EX.hasPlaceType, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasPlaceType, RDFS.range, EX.PlaceType))
+        triples.append((EX.hasPriceRange, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasPriceRange, RDFS.range, EX.PriceRange))
+        triples.append((EX.hasContact, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasContact, RDFS.range, EX.Contact))
+        triples.append((EX.hasActivity, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasActivity, RDFS.range, EX.Activity))
+        triples.append((EX.hasName, RDFS.domain, OWL.Thing))
+        triples.append((EX.hasName, RDFS.range, XSD.string))
+        triples.append((EX.hasDescription, RDFS.domain, OWL.Thing))
+        triples.append((EX.hasDescription, RDFS.range, XSD.string))
+        triples.append((EX.hasAddress, RDFS.domain, OWL.Thing))
+        triples.append((EX.hasAddress, RDFS.range, XSD.string))
+        triples.append((EX.hasPhone, RDFS.domain, EX.Contact))
+        triples.append((EX.hasPhone, RDFS.range, XSD.string))
+        triples.append((EX.hasEmail, RDFS.domain, EX.Contact))
+        triples.append((EX.hasEmail, RDFS.range, XSD.string))
+        triples.append((EX.hasUrl, RDFS.domain, EX.TouristPlace))
+        triples.append((EX.hasUrl, RDFS.range, XSD.string))
+        self._schema = triples
+        self._emit(triples)
+
+    def _get_or_create(self, name, cls, cache_set, triples):
         safe_name = clean_uri(name)
         if not safe_name:
             # No crear recursos para valores vacíos o nulos
             return None
         uri = EX[f"{cls.__name__.lower()}_{safe_name}"]
-        if name not in cache_set:
-            self.graph.add((uri, RDF.type, getattr(EX, cls.__name__)))
-            self.graph.add((uri, RDFS.label, Literal(name)))
-            cache_set.add(name)
+        # Deduplicación central: cada recurso se declara una sola vez
+        if uri not in cache_set:
+            declaration = [(uri, RDF.type, getattr(EX, cls.__name__)), (uri, RDFS.label, Literal(name))]
+            triples.extend(declaration)
+            self.declarations[uri] = declaration
+            cache_set.add(uri)
         return uri
 
-    def _get_or_create_province(self, province_name):
-        return self._get_or_create(province_name, Province, self.provinces)
+    def _get_or_create_province(self, province_name, triples):
+        return self._get_or_create(province_name, Province, self.provinces, triples)
 
-    def _get_or_create_cuisine(self, cuisine_name):
-        return self._get_or_create(cuisine_name, CuisineType, self.cuisine_types)
+    def _get_or_create_cuisine(self, cuisine_name, triples):
+        return self._get_or_create(cuisine_name, CuisineType, self.cuisine_types, triples)
 
-    def _get_or_create_place_type(self, place_type_name):
-        return self._get_or_create(place_type_name, PlaceType, self.place_types)
+    def _get_or_create_place_type(self, place_type_name, triples):
+        return self._get_or_create(place_type_name, PlaceType, self.place_types, triples)
 
-    def _get_or_create_price_range(self, price_range):
-        return self._get_or_create(price_range, PriceRange, self.price_ranges)
+    def _get_or_create_price_range(self, price_range, triples):
+        return self._get_or_create(price_range, PriceRange, self.price_ranges, triples)
 
-    def _get_or_create_activity(self, activity_name):
-        return self._get_or_create(activity_name, Activity, self.activities)
+    def _get_or_create_activity(self, activity_name, triples):
+        return self._get_or_create(activity_name, Activity, self.activities, triples)
 
-    def _create_contact(self, phones, emails):
-        contact_uri = EX["contact_" + str(uuid4())]
-        self.graph.add((contact_uri, RDF.type, EX.Contact))
+    def _create_contact(self, place_id, phones, emails, triples):
+        contact_uri = EX["contact_" + place_id]
+        triples.append((contact_uri, RDF.type, EX.Contact))
         for phone in phones:
-            self.graph.add((contact_uri, EX.hasPhone, Literal(phone)))
+            triples.append((contact_uri, EX.hasPhone, Literal(phone)))
         for email in emails:
-            self.graph.add((contact_uri, EX.hasEmail, Literal(email)))
+            triples.append((contact_uri, EX.hasEmail, Literal(email)))
         return contact_uri
 
     def add_place(self, name, province, cuisine_types, description, price_range=None, place_types=None, address=None, url=None, phones=None, emails=None, activities=None):
-        place_uri = EX[str(uuid4())]
-        self.graph.add((place_uri, RDF.type, EX.TouristPlace))
-        self.graph.add((place_uri, EX.hasName, Literal(name)))
-        self.graph.add((place_uri, EX.hasDescription, Literal(description)))
+        place_uri, triples = self._place_triples(
+            name, province, cuisine_types, description, price_range, place_types, address, url, phones, emails, activities
+        )
+        self._emit(triples)
+        return place_uri
+
+    def _place_triples(self, name, province, cuisine_types, description, price_range=None, place_types=None, address=None, url=None, phones=None, emails=None, activities=None):
+        triples = []
+        place_id = stable_id(url, name)
+        place_uri = EX["place_" + place_id]
+        triples.append((place_uri, RDF.type, EX.TouristPlace))
+        triples.append((place_uri, EX.hasName, Literal(name)))
+        triples.append((place_uri, EX.hasDescription, Literal(description)))
         if address:
-            self.graph.add((place_uri, EX.hasAddress, Literal(address)))
+            triples.append((place_uri, EX.hasAddress, Literal(address)))
         if url:
-            self.graph.add((place_uri, EX.hasUrl, Literal(url)))
+            triples.append((place_uri, EX.hasUrl, Literal(url)))
         if province:
-            prov_uri = self._get_or_create_province(province)
+            prov_uri = self._get_or_create_province(province, triples)
             if prov_uri:
-                self.graph.add((place_uri, EX.locatedInProvince, prov_uri))
+                triples.append((place_uri, EX.locatedInProvince, prov_uri))
         # Filtrar valores vacíos o nulos antes de crear recursos
         for cuisine in filter(None, cuisine_types or []):
-            cuisine_uri = self._get_or_create_cuisine(cuisine)
+            cuisine_uri = self._get_or_create_cuisine(cuisine, triples)
             if cuisine_uri:
-                self.graph.add((place_uri, EX.hasCuisineType, cuisine_uri))
+                triples.append((place_uri, EX.hasCuisineType, cuisine_uri))
         for pt in filter(None, place_types or []):
-            pt_uri = self._get_or_create_place_type(pt)
+            pt_uri = self._get_or_create_place_type(pt, triples)
             if pt_uri:
-                self.graph.add((place_uri, EX.hasPlaceType, pt_uri))
+                triples.append((place_uri, EX.hasPlaceType, pt_uri))
         if price_range:
-            pr_uri = self._get_or_create_price_range(price_range)
+            pr_uri = self._get_or_create_price_range(price_range, triples)
             if pr_uri:
-                self.graph.add((place_uri, EX.hasPriceRange, pr_uri))
+                triples.append((place_uri, EX.hasPriceRange, pr_uri))
         if (phones or emails):
-            contact_uri = self._create_contact(phones or [], emails or [])
-            self.graph.add((place_uri, EX.hasContact, contact_uri))
+            contact_uri = self._create_contact(place_id, phones or [], emails or [], triples)
+            triples.append((place_uri, EX.hasContact, contact_uri))
         for act in filter(None, activities or []):
-            act_uri = self._get_or_create_activity(act)
+            act_uri = self._get_or_create_activity(act, triples)
             if act_uri:
-                self.graph.add((place_uri, EX.hasActivity, act_uri))
+                triples.append((place_uri, EX.hasActivity, act_uri))
+        return place_uri, triples
 
-    def parse_json_folder(self, folder_path):
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith(".json"):
-                    self._parse_file(os.path.join(root, file))
+    def parse_json_folder(self, folder_path, workers=None, paths=None, emit=True):
+        """
+        Parsea los JSON en un pool de procesos (registros planos) y los inserta en orden.
+        workers=1 parsea en el proceso actual. `paths` limita el parseo a esos archivos.
+        Con emit=False los triples solo se guardan en el manifest (requiere `record`).
+        """
+        if paths is None:
+            paths = _list_json_files(folder_path)
+        if workers == 1:
+            results = map(_parse_with_hash, paths)
+            self._add_parsed(folder_path, paths, results, emit)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_parse_with_hash, paths, chunksize=64)
+            self._add_parsed(folder_path, paths, results, emit)
+
+    def _add_parsed(self, folder_path, paths, results, emit=True):
+        for path, (sha, fields) in zip(paths, results):
+            place_uri, triples = self._place_triples(**fields)
+            if emit:
+                self._emit(triples)
+            entry = {"sha256": sha, "place": str(place_uri)}
+            if self.record:
+                entry.update(self._file_record(triples))
+            self.manifest[os.path.relpath(path, folder_path)] = entry
+
+    def _file_record(self, triples):
+        """
+        Triples propios de un archivo (lugar y contacto) y la declaración de cada recurso compartido
+        que usa, aunque lo hubiera creado otro archivo: así el registro se puede sustituir por sí solo.
+        """
+        own = [t for t in triples if t[0] not in self.declarations]
+        resources = {}
+        for _, _, obj in own:
+            if obj in self.declarations:
+                if obj not in self._declaration_nt:
+                    self._declaration_nt[obj] = to_ntriples(self.declarations[obj])
+                resources[str(obj)] = self._declaration_nt[obj]
+        return {"ntriples": to_ntriples(own), "resources": resources}
 
     def _parse_file(self, path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            secciones = data.get("secciones", [])
-            fragments = sum((sec.get("fragmentos", []) for sec in secciones), [])
-
-            provincia = None
-            cocina = []
-            precio = None
-            descripcion = ""
-            nombre = data.get("titulo") or os.path.basename(path)
-            place_types = []
-            address = None
-            url = data.get("url")
-            phones = data.get("telefonos", [])
-            emails = data.get("emails", [])
-            activities = []
-
-            # Provincia
-            for frag in fragments:
-                if frag.startswith("Zona "):
-                    provincia = frag.replace("Zona ", "").strip()
-                    break
-                if frag.startswith("Sobre "):
-                    provincia = frag.replace("Sobre ", "").strip()
-                    break
-                if frag.startswith("Destinos "):
-                    # Tomar el primer destino como provincia principal
-                    provincia = frag.replace("Destinos ", "").split()[0]
-                    break
-
-            # Tipos de cocina
-            for frag in fragments:
-                if "Tipo de Cocina" in frag:
-                    cocina = [c.strip() for c in frag.replace("Tipo de Cocina", "").replace("Cocina", "").split() if len(c.strip()) > 2 and c.lower() not in ["de", "tipo"]]
-                    break
-
-            # Rango de precios
-            for frag in fragments:
-                if "Rango de precios" in frag:
-                    precio = frag.replace("Rango de precios", "").strip()
-                    break
-
-            # Tipos de lugar
-            for frag in fragments:
-                if "Tipo de lugar" in frag:
-                    place_types = [t.strip() for t in frag.replace("Tipo de lugar", "").split() if len(t.strip()) > 2]
-                    break
-
-            # Dirección
-            for frag in fragments:
-                if "Dirección:" in frag:
-                    address = frag.split("Dirección:")[-1].strip()
-                    break
-
-            # Actividades, paquetes, eventos (heurística simple)
-            for frag in fragments:
-                if any(word in frag.lower() for word in ["evento", "paquete", "excursión", "actividad", "golf", "vacaciones", "combinados", "premium", "plan viaje"]):
-                    acts = [a.strip() for a in frag.split() if len(a.strip()) > 3]
-                    activities.extend(acts)
-
-            # Descripción (primer fragmento largo que no sea cocina, provincia, precio, tipo de lugar)
-            for frag in fragments:
-                if (
-                    frag not in (provincia or "")
-                    and frag not in " ".join(cocina)
-                    and frag not in " ".join(place_types)
-                    and (not precio or frag != precio)
-                    and len(frag) > 30
-                    and not frag.startswith("Tipo de Cocina")
-                    and not frag.startswith("Rango de precios")
-                    and not frag.startswith("Zona ")
-                    and not frag.startswith("Sobre ")
-                    and not frag.startswith("Tipo de lugar")
-                ):
-                    descripcion = frag
-                    break
-
-            # Si no se encontró provincia, buscar en fragmentos que contengan "Provincia:"
-            if not provincia:
-                for frag in fragments:
-                    if "Provincia:" in frag:
-                        provincia = frag.split("Provincia:")[-1].strip()
-                        break
-
-            # Si no se encontró cocina, buscar fragmentos con palabras típicas de cocina
-            if not cocina:
-                for frag in fragments:
-                    if any(word in frag.lower() for word in ["cocina", "asados", "cubana", "italiana", "internacional", "gourmet", "vegana", "vegetariana"]):
-                        cocina = [c.strip() for c in frag.split() if len(c.strip()) > 2]
-                        break
-
-            # Si no se encontró descripción, usar el primer fragmento largo
-            if not descripcion:
-                for frag in fragments:
-                    if len(frag) > 30:
-                        descripcion = frag
-                        break
-
-            provincia = provincia or "Unknown"
-            nombre = nombre or os.path.basename(path)
-
-            self.add_place(
-                nombre, provincia, cocina, descripcion, precio,
-                place_types=place_types, address=address, url=url,
-                phones=phones, emails=emails, activities=activities
-            )
+        return self.add_place(**parse_place_file(path))
+
+    def build_incremental(self, folder_path, manifest_path, workers=None):
+        """
+        Actualiza los registros por archivo del manifest anterior re-parseando solo los JSON nuevos
+        o modificados; los de archivos borrados desaparecen. No carga ni reescribe la ontología:
+        después se genera con export(). Sin manifest previo con registros, parsea todos los archivos.
+        """
+        previous = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        if not all("ntriples" in entry for entry in previous.values()):
+            previous = {}
+
+        current = {os.path.relpath(p, folder_path): p for p in _list_json_files(folder_path)}
+        changed = []
+        unchanged = {}
+        for rel, path in current.items():
+            sha = file_sha256(path)
+            entry = previous.get(rel)
+            if entry and entry["sha256"] == sha:
+                unchanged[rel] = entry
+            else:
+                changed.append(path)
+
+        self.record = True
+        self.manifest = dict(unchanged)
+        if changed:
+            self.parse_json_folder(folder_path, workers=workers, paths=changed, emit=False)
+        return {
+            "added": sum(1 for p in changed if os.path.relpath(p, folder_path) not in previous),
+            "updated": sum(1 for p in changed if os.path.relpath(p, folder_path) in previous),
+            "removed": sum(1 for rel in previous if rel not in current),
+            "unchanged": len(unchanged),
+        }
+
+    def export(self, filepath):
+        """
+        Escribe la ontología completa a partir de los registros del manifest: en N-Triples se
+        concatenan sin re-parsear (.nt); en otro caso se exporta a RDF/XML.
+        """
+        resources = {}
+        for rel in sorted(self.manifest):
+            for uri, nt in self.manifest[rel]["resources"].items():
+                resources.setdefault(uri, nt)
+        data = "".join(
+            [to_ntriples(self._schema)]
+            + list(resources.values())
+            + [self.manifest[rel]["ntriples"] for rel in sorted(self.manifest)]
+        )
+        tmp_path = filepath + ".tmp"
+        if filepath.endswith(".nt"):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+        else:
+            graph = Graph()
+            for prefix, namespace in self.graph.namespaces():
+                graph.bind(prefix, namespace)
+            graph.parse(data=data, format="nt")
+            graph.serialize(destination=tmp_path, format="xml")
+        os.replace(tmp_path, filepath)
+
+    def save_manifest(self, manifest_path):
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
 
     def save(self, filepath="data/tourism.owl"):
+        if self._out is not None:
+            # En modo streaming los triples ya están en el archivo N-Triples
+            self.close()
+            return
         self.graph.serialize(destination=filepath, format="xml")
 
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+def _list_json_files(folder_path):
+    return [
+        os.path.join(root, file)
+        for root, _, files in sorted(os.walk(folder_path))
+        for file in sorted(files)
+        if file.endswith(".json")
+    ]
+
+def _parse_with_hash(path):
+    return file_sha256(path), parse_place_file(path)
+
+ACTIVITY_WORDS = ["evento", "paquete", "excursión", "actividad", "golf", "vacaciones", "combinados", "premium", "plan viaje"]
+CUISINE_WORDS = ["cocina", "asados", "cubana", "italiana", "internacional", "gourmet", "vegana", "vegetariana"]
+
+def parse_place_file(path):
+    """
+    Extrae de un JSON scrapeado los argumentos de OntologyBuilder.add_place.
+    Función de módulo (sin estado) para poder ejecutarse en un pool de procesos.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    secciones = data.get("secciones", [])
+    fragments = list(chain.from_iterable(sec.get("fragmentos", []) for sec in secciones))
+
+    provincia = None
+    cocina = None
+    precio = None
+    descripcion = ""
+    nombre = data.get("titulo") or os.path.basename(path)
+    place_types = None
+    address = None
+    url = data.get("url")
+    phones = data.get("telefonos", [])
+    emails = data.get("emails", [])
+    activities = []
+    provincia_alt = None
+    cocina_alt = None
+    primer_largo = None
+
+    # Una sola pasada: para cada campo se queda con el primer fragmento que coincide
+    for frag in fragments:
+        if provincia is None:
+            if frag.startswith("Zona "):
+                provincia = frag.replace("Zona ", "").strip()
+            elif frag.startswith("Sobre "):
+                provincia = frag.replace("Sobre ", "").strip()
+            elif frag.startswith("Destinos "):
+                # Tomar el primer destino como provincia principal
+                provincia = frag.replace("Destinos ", "").split()[0]
+        if cocina is None and "Tipo de Cocina" in frag:
+            cocina = [c.strip() for c in frag.replace("Tipo de Cocina", "").replace("Cocina", "").split() if len(c.strip()) > 2 and c.lower() not in ["de", "tipo"]]
+        if precio is None and "Rango de precios" in frag:
+            precio = frag.replace("Rango de precios", "").strip()
+        if place_types is None and "Tipo de lugar" in frag:
+            place_types = [t.strip() for t in frag.replace("Tipo de lugar", "").split() if len(t.strip()) > 2]
+        if address is None and "Dirección:" in frag:
+            address = frag.split("Dirección:")[-1].strip()
+        frag_lower = frag.lower()
+        # Actividades, paquetes, eventos (heurística simple)
+        if any(word in frag_lower for word in ACTIVITY_WORDS):
+            activities.extend(a.strip() for a in frag.split() if len(a.strip()) > 3)
+        # Candidatos de respaldo si no aparecen los campos principales
+        if provincia_alt is None and "Provincia:" in frag:
+            provincia_alt = frag.split("Provincia:")[-1].strip()
+        if cocina_alt is None and any(word in frag_lower for word in CUISINE_WORDS):
+            cocina_alt = [c.strip() for c in frag.split() if len(c.strip()) > 2]
+        if primer_largo is None and len(frag) > 30:
+            primer_largo = frag
+
+    cocina = cocina or []
+    place_types = place_types or []
+
+    # Descripción (primer fragmento largo que no sea cocina, provincia, precio, tipo de lugar)
+    cocina_text = " ".join(cocina)
+    place_types_text = " ".join(place_types)
+    for frag in fragments:
+        if (
+            frag not in (provincia or "")
+            and frag not in cocina_text
+            and frag not in place_types_text
+            and (not precio or frag != precio)
+            and len(frag) > 30
+            and not frag.startswith("Tipo de Cocina")
+            and not frag.startswith("Rango de precios")
+            and not frag.startswith("Zona ")
+            and not frag.startswith("Sobre ")
+            and not frag.startswith("Tipo de lugar")
+        ):
+            descripcion = frag
+            break
+
+    # Si no se encontró provincia, usar fragmentos que contengan "Provincia:"
+    if not provincia:
+        provincia = provincia_alt
+    # Si no se encontró cocina, usar fragmentos con palabras típicas de cocina
+    if not cocina:
+        cocina = cocina_alt or []
+    # Si no se encontró descripción, usar el primer fragmento largo
+    if not descripcion:
+        descripcion = primer_largo or ""
+
+    return {
+        "name": nombre or os.path.basename(path),
+        "province": provincia or "Unknown",
+        "cuisine_types": cocina,
+        "description": descripcion,
+        "price_range": precio,
+        "place_types": place_types,
+        "address": address,
+        "url": url,
+        "phones": phones,
+        "emails": emails,
+        "activities": activities,
+    }
+
 # Clases auxiliares para el tipado en _get_or_create
 class Province: pass
 class CuisineType: pass
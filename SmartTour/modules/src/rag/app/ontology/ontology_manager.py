@@ -1,26 +1,270 @@
-from rdflib import Graph, Namespace, Literal, URIRef
-from rdflib.plugins.sparql import prepareQuery
-import uuid
+from rdflib import Graph, Namespace, Literal, RDF, RDFS
+from collections import defaultdict, namedtuple
+import atexit
+import hashlib
+import threading
+import unicodedata
+import os
+import pickle
+from .ontology_builder import to_ntriples
+from ..cache import dump_pickle
 
 EX = Namespace("http://smarttour.org/tourism#")  # Cambiado el namespace
 
+def file_sha256(path):
+    """Hash del contenido de un archivo, usado para invalidar las cachés derivadas de la ontología."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def normalize_key(text):
+    """Clave de los índices: minúsculas, sin tildes y sin espacios sobrantes."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+# Resultado de las búsquedas: mismas columnas que devolvían las consultas SPARQL
+Place = namedtuple("Place", ["name", "desc"])
+
+# Índices materializados: propiedad RDF -> nombre del índice
+_INDEXED_PROPERTIES = {
+    EX.locatedInProvince: "province",
+    EX.hasPlaceType: "type",
+    EX.hasCuisineType: "cuisine",
+    EX.hasActivity: "activity",
+}
+
+# Versión del formato de la caché compilada (cambiarla invalida las cachés antiguas)
+_CACHE_FORMAT = 3
+
+class OntologyWriter:
+    """
+    Escritor de larga vida para el conocimiento obtenido por fallback.
+    Encola las inserciones y las vuelca por lotes a un archivo N-Triples de solo añadido;
+    los índices en memoria se actualizan en el momento de insertar.
+    """
+
+    def __init__(self, store_path, batch_size=8):
+        self.store_path = store_path
+        self.batch_size = batch_size
+        self._queue = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def insert(self, manager, name, province, description):
+        place_uri = EX["FallbackPlace_" + hashlib.sha1(normalize_key(name).encode("utf-8")).hexdigest()[:16]]
+        record = (place_uri, name, description, province)
+        triples = [
+            (place_uri, RDF.type, EX.TouristPlace),
+            (place_uri, EX.hasName, Literal(name)),
+            (place_uri, EX.hasDescription, Literal(description)),
+            (place_uri, EX.locatedInProvince, Literal(province)),
+        ]
+        # Si el grafo ya está cargado se mantiene sincronizado; si no, no se fuerza su parseo
+        if manager._graph is not None:
+            for triple in triples:
+                manager._graph.add(triple)
+        place = manager.add_place_record(*record)
+        with self._lock:
+            self._queue.append((record, triples))
+            if len(self._queue) >= self.batch_size:
+                self._flush_locked()
+        return place
+
+    def pending(self):
+        """Registros encolados que aún no se han escrito en disco."""
+        with self._lock:
+            return [record for record, _ in self._queue]
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._queue:
+            return
+        try:
+            with open(self.store_path, "a", encoding="utf-8") as f:
+                for _, triples in self._queue:
+                    f.write(to_ntriples(triples))
+            self._queue = []
+        except OSError as e:
+            print(f"[OntologyWriter] No se pudo guardar el conocimiento de fallback: {e}")
+
 class OntologyManager:
     def __init__(self, owl_path="data/tourism.owl"):
-        self.graph = Graph()
-        self.graph.parse(owl_path, format="xml")
+        self.owl_path = owl_path
+        # Caché compilada de los índices, invalidada por el hash del archivo OWL
+        self.cache_path = owl_path + ".cache.pkl"
+        self.owl_hash = file_sha256(owl_path)
+        self._graph = None
+        if not self._load_cache():
+            self._build_indexes()
+            self._save_cache()
+        # Conocimiento añadido por el fallback (archivo N-Triples de solo añadido)
+        self.fallback_path = owl_path + ".fallback.nt"
+        self.fallback_writer = OntologyWriter(self.fallback_path)
+        self._load_fallback_store()
+
+    @property
+    def graph(self):
+        """El RDF/XML solo se parsea cuando se necesita el grafo (índices sin caché o inserciones)."""
+        if self._graph is None:
+            self._graph = Graph()
+            self._graph.parse(self.owl_path, format="nt" if self.owl_path.endswith(".nt") else "xml")
+        return self._graph
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            print(f"[OntologyManager] Caché ilegible, se reconstruye: {e}")
+            return False
+        if cached.get("owl_hash") != self.owl_hash or cached.get("format") != _CACHE_FORMAT:
+            return False
+        self.places = cached["places"]
+        self.indexes = cached["indexes"]
+        self.fallback_places = cached["fallback_places"]
+        self.fallback_offset = cached["fallback_offset"]
+        self._province_cache = {}
+        return True
+
+    def _save_cache(self):
+        try:
+            dump_pickle(
+                {
+                    "format": _CACHE_FORMAT,
+                    "owl_hash": self.owl_hash,
+                    "places": self.places,
+                    "indexes": self.indexes,
+                    # Lugares de fallback ya incorporados y hasta qué byte se leyó su archivo
+                    "fallback_places": self.fallback_places,
+                    "fallback_offset": self.fallback_offset,
+                },
+                self.cache_path,
+            )
+        except OSError as e:
+            print(f"[OntologyManager] No se pudo guardar la caché: {e}")
+
+    def _label(self, node):
+        """Texto de un nodo: su rdfs:label si es un recurso, o el propio literal."""
+        if isinstance(node, Literal):
+            return str(node)
+        label = self.graph.value(node, RDFS.label)
+        return str(label) if label is not None else str(node).split("#")[-1]
+
+    def _build_indexes(self):
+        """Construye en memoria los índices lugar -> (nombre, descripción) y valor -> lugares."""
+        self.places = {}
+        self.indexes = {name: defaultdict(list) for name in ["name", *_INDEXED_PROPERTIES.values()]}
+        self.fallback_places = []
+        self.fallback_offset = 0
+        self._province_cache = {}
+        for place_uri in self.graph.subjects(RDF.type, EX.TouristPlace):
+            self._index_place(place_uri)
+
+    def _index_place(self, place_uri):
+        name = self.graph.value(place_uri, EX.hasName)
+        if name is None:
+            return
+        desc = self.graph.value(place_uri, EX.hasDescription)
+        place = Place(str(name), str(desc) if desc is not None else "")
+        self.places[place_uri] = place
+        self.indexes["name"][normalize_key(place.name)].append(place)
+        for prop, index_name in _INDEXED_PROPERTIES.items():
+            for value in self.graph.objects(place_uri, prop):
+                self.indexes[index_name][normalize_key(self._label(value))].append(place)
+        self._province_cache.clear()
+
+    def _load_fallback_store(self):
+        """
+        Incorpora a los índices las líneas del archivo de fallback que la caché compilada aún no tiene.
+        El archivo es de solo añadido: basta con parsear lo escrito desde `fallback_offset`.
+        """
+        data = b""
+        if os.path.exists(self.fallback_path):
+            with open(self.fallback_path, "rb") as f:
+                data = f.read()
+        changed = False
+        if len(data) < self.fallback_offset:
+            # El archivo se reemplazó o se borró: los lugares de fallback de la caché ya no valen
+            self._build_indexes()
+            changed = True
+        end = data.rfind(b"\n") + 1  # solo líneas completas
+        if end > self.fallback_offset:
+            tail = data[self.fallback_offset:end].decode("utf-8")
+            store = Graph()
+            try:
+                store.parse(data=tail, format="nt")
+            except Exception:
+                # Archivos escritos por versiones anteriores con literales multilínea de Turtle
+                store = Graph()
+                store.parse(data=tail, format="turtle")
+            # Orden de escritura (el grafo no lo conserva), para que el índice de pasajes sea reproducible
+            subjects = sorted(set(store.subjects(RDF.type, EX.TouristPlace)), key=lambda s: tail.find(s.n3()))
+            for place_uri in subjects:
+                self.add_place_record(
+                    place_uri,
+                    store.value(place_uri, EX.hasName),
+                    store.value(place_uri, EX.hasDescription),
+                    store.value(place_uri, EX.locatedInProvince),
+                )
+            self.fallback_offset = end
+            changed = True
+        if changed:
+            self._save_cache()
+        for record in self.fallback_writer.pending():
+            self.add_place_record(*record)
+
+    def add_place_record(self, place_uri, name, desc, province):
+        """Añade un lugar directamente a los índices en memoria, sin pasar por el grafo."""
+        if place_uri in self.places:
+            return self.places[place_uri]
+        place = Place(str(name), str(desc or ""))
+        self.places[place_uri] = place
+        self.fallback_places.append(place)
+        self.indexes["name"][normalize_key(place.name)].append(place)
+        if province:
+            self.indexes["province"][normalize_key(province)].append(place)
+        self._province_cache.clear()
+        return place
+
+    @property
+    def version(self):
+        """Versión del contenido: cambia con el OWL y con cada lugar añadido por fallback."""
+        return f"{self.owl_hash}:{len(self.places)}"
+
+    def get_all_places(self):
+        return list(self.places.values())
 
     def search_places_by_province(self, province_name):
-        q = prepareQuery("""
-        SELECT ?name ?desc WHERE {
-            ?place a ex:TouristPlace ;
-                   ex:hasName ?name ;
-                   ex:hasDescription ?desc ;
-                   ex:locatedInProvince ?prov .
-            FILTER(CONTAINS(LCASE(?prov), LCASE(?province)))
-        }
-        """, initNs={"ex": EX})
-
-        return self.graph.query(q, initBindings={"province": Literal(province_name)})
+        """Lugares cuya provincia contiene el texto buscado (p. ej. "habana" -> "La Habana")."""
+        key = normalize_key(province_name)
+        if key not in self._province_cache:
+            provinces = self.indexes["province"]
+            if key in provinces:
+                places = list(provinces[key])
+            else:
+                # Solo se recorren los nombres de provincia, no todos los lugares
+                places = [p for prov, plist in provinces.items() if key in prov for p in plist]
+            self._province_cache[key] = places
+        return self._province_cache[key]
+
+    def search_places_by_name(self, name):
+        return self.indexes["name"].get(normalize_key(name), [])
+
+    def search_places_by_type(self, place_type):
+        return self.indexes["type"].get(normalize_key(place_type), [])
+
+    def search_places_by_cuisine(self, cuisine):
+        return self.indexes["cuisine"].get(normalize_key(cuisine), [])
+
+    def search_places_by_activity(self, activity):
+        return self.indexes["activity"].get(normalize_key(activity), [])
 
     def insert_fallback_knowledge(self, name, province, description):
         """
@@ -41,14 +285,5 @@ class OntologyManager:
         else:
             desc_text = str(description)
 
-        # Crear un URI único para el nuevo lugar
-        place_uri = EX["FallbackPlace_" + str(uuid.uuid4())]
-
-        # Añadir triples a la ontología
-        self.graph.add((place_uri, EX.hasName, Literal(name)))
-        self.graph.add((place_uri, EX.hasDescription, Literal(desc_text)))
-        self.graph.add((place_uri, EX.locatedInProvince, Literal(province)))
-        self.graph.add((place_uri, EX.type, EX.TouristPlace))
-
-        # Opcional: guardar los cambios en el archivo OWL
-        # self.graph.serialize(destination="data/tourism.owl", format="xml")
+        # Se encola en el almacén de fallback y queda indexado al momento
+        return self.fallback_writer.insert(self, name, province, desc_text)
@@ -1,25 +1,28 @@
 from .ontology_manager import OntologyManager
-import nltk
-import spacy
+from .keyword_matcher import KeywordMatcher
+from .nlp_resources import load_nlp
 from nltk.corpus import stopwords
 from nltk.stem import SnowballStemmer
 from nltk.tokenize import word_tokenize
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 import re
-from fuzzywuzzy import fuzz, process
-from collections import defaultdict
+from rapidfuzz import fuzz, process
+import atexit
+import threading
+from ..cache import LRUCache, dump_pickle, load_pickle
 
-# Descargar recursos necesarios de NLTK (ejecutar una vez)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+INTENTS = {
+    'search_place': ['buscar', 'encontrar', 'donde', 'ubicacion', 'lugar'],
+    'recommendation': ['recomendar', 'sugerir', 'mejor', 'top', 'buenos'],
+    'information': ['informacion', 'detalles', 'datos', 'sobre', 'que es'],
+    'comparison': ['comparar', 'diferencia', 'mejor que', 'versus'],
+    'activity': ['hacer', 'actividad', 'tour', 'visitar', 'experiencia'],
+    'food': ['comer', 'comida', 'restaurante', 'gastronomia', 'cocina'],
+    'accommodation': ['dormir', 'hotel', 'hospedaje', 'alojamiento']
+}
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
 
 class OntologyRetriever:
     def __init__(self, config):
@@ -27,15 +30,13 @@ class OntologyRetriever:
         
         # Inicializar herramientas NLP
         self.stemmer = SnowballStemmer('spanish')
-        self.stop_words = set(stopwords.words('spanish'))
-        self.stop_words.update(['que', 'cual', 'donde', 'como', 'cuando', 'quien', 'hay', 'tiene', 'quiero', 'busco', 'necesito'])
-        
-        # Cargar modelo de spaCy para español (opcional, más preciso)
         try:
-            self.nlp = spacy.load("es_core_news_sm")
-        except OSError:
-            self.nlp = None
-            print("Modelo spaCy español no encontrado. Usando NLTK básico.")
+            self.stop_words = set(stopwords.words('spanish'))
+        except LookupError:
+            # Los recursos se descargan con setup_nlp_resources() (python nlp_resources.py)
+            print("Stopwords de NLTK no encontradas. Ejecuta setup_nlp_resources().")
+            self.stop_words = set()
+        self.stop_words.update(['que', 'cual', 'donde', 'como', 'cuando', 'quien', 'hay', 'tiene', 'quiero', 'busco', 'necesito'])
         
         # Diccionarios semánticos expandidos
         self.province_mapping = {
@@ -78,6 +79,19 @@ class OntologyRetriever:
             "aventura": ["extremo", "adrenalina", "tirolesa", "escalada"]
         }
         
+        # Diccionarios compilados una sola vez: una regex por diccionario para las subcadenas
+        # y listas de términos para el fuzzy matching vectorizado de RapidFuzz
+        self.intent_matcher = KeywordMatcher(INTENTS, include_keys=False)
+        self.intent_terms = list(self.intent_matcher.categories_by_term)
+        self.place_type_matcher = KeywordMatcher(self.place_type_synonyms)
+        self.activity_matcher = KeywordMatcher(self.activity_synonyms)
+        self.province_terms = []
+        self.province_of_term = []
+        for province, synonyms in self.province_mapping.items():
+            for term in [province] + synonyms:
+                self.province_terms.append(term.lower())
+                self.province_of_term.append(province)
+        
         # Inicializar vectorizador TF-IDF
         self.vectorizer = TfidfVectorizer(
             max_features=1000,
@@ -86,8 +100,66 @@ class OntologyRetriever:
             analyzer='word'
         )
         
-        # Cache para búsquedas
-        self.query_cache = {}
+        # Matriz TF-IDF de los lugares: se ajusta una sola vez por versión de la ontología
+        self.tfidf_places = []
+        self.tfidf_matrix = None
+        self._load_tfidf_index()
+        
+        # Cache para búsquedas (acotada por tamaño y TTL); con `persist` se recupera al reiniciar
+        cache_config = config["ontology"].get("query_cache", {})
+        self.query_cache = LRUCache(
+            maxsize=cache_config.get("maxsize", 2048),
+            ttl=cache_config.get("ttl", 6 * 3600),
+        )
+        persist_path = cache_config.get("persist_path")
+        if persist_path is None and cache_config.get("persist", False):
+            persist_path = self.manager.owl_path + ".queries.pkl"
+        if persist_path:
+            self.query_cache.load(persist_path)
+            atexit.register(self.query_cache.save, persist_path)
+
+        # Modelo de spaCy, cargado la primera vez que se necesita
+        self._nlp = None
+        self._nlp_loaded = False
+        self._nlp_lock = threading.Lock()
+
+    def _load_tfidf_index(self):
+        """Carga (o ajusta y guarda junto al OWL) el vectorizador y la matriz TF-IDF de los lugares"""
+        try:
+            owl_path = self.manager.owl_path
+            cache_path = owl_path + ".tfidf.pkl"
+            owl_hash = self.manager.version
+            cached = load_pickle(cache_path, {})
+            if isinstance(cached, dict) and cached.get("owl_hash") == owl_hash:
+                self.vectorizer = cached["vectorizer"]
+                self.tfidf_matrix = cached["matrix"]
+                self.tfidf_places = cached["places"]
+                return
+
+            self.tfidf_places = [(place.name, place.desc) for place in self.manager.get_all_places()]
+            if not self.tfidf_places:
+                return
+            documents = [f"{name} {desc}" for name, desc in self.tfidf_places]
+            self.tfidf_matrix = self.vectorizer.fit_transform(documents)
+            dump_pickle({
+                "owl_hash": owl_hash,
+                "vectorizer": self.vectorizer,
+                "matrix": self.tfidf_matrix,
+                "places": self.tfidf_places,
+            }, cache_path)
+        except Exception as e:
+            print(f"Error construyendo el índice TF-IDF: {e}")
+            self.tfidf_places = []
+            self.tfidf_matrix = None
+
+    @property
+    def nlp(self):
+        # Modelo de spaCy para español (opcional, más preciso); None si no está instalado
+        with self._nlp_lock:
+            if not self._nlp_loaded:
+                self._nlp = load_nlp()
+                self._nlp_loaded = True
+        return self._nlp
 
     def preprocess_query(self, query):
         """Preprocesa la consulta usando técnicas NLP avanzadas"""
@@ -96,89 +168,96 @@ class OntologyRetriever:
         
         # Usar spaCy si está disponible
         if self.nlp:
-            doc = self.nlp(query)
-            
-            # Extraer entidades nombradas
-            entities = [(ent.text, ent.label_) for ent in doc.ents]
-            
-            # Extraer sustantivos, adjetivos y verbos importantes
-            important_tokens = []
-            for token in doc:
-                if (not token.is_stop and not token.is_punct and 
-                    token.pos_ in ['NOUN', 'ADJ', 'VERB', 'PROPN'] and 
-                    len(token.text) > 2):
-                    important_tokens.append(token.lemma_)
-            
-            return {
-                'original': query,
-                'entities': entities,
-                'keywords': important_tokens,
-                'cleaned': ' '.join(important_tokens)
-            }
-        else:
-            # Fallback usando NLTK
+            return self._query_data_from_doc(query, self.nlp(query))
+        return self._preprocess_with_nltk(query)
+
+    def preprocess_queries(self, queries, batch_size=32):
+        """Como preprocess_query para muchas consultas, procesadas en lote con nlp.pipe"""
+        cleaned = [query.lower().strip() for query in queries]
+        if not self.nlp:
+            return [self._preprocess_with_nltk(query) for query in cleaned]
+        return [
+            self._query_data_from_doc(query, doc)
+            for query, doc in zip(cleaned, self.nlp.pipe(cleaned, batch_size=batch_size))
+        ]
+
+    def _query_data_from_doc(self, query, doc):
+        # Extraer entidades nombradas
+        entities = [(ent.text, ent.label_) for ent in doc.ents]
+        
+        # Extraer sustantivos, adjetivos y verbos importantes
+        important_tokens = []
+        for token in doc:
+            if (not token.is_stop and not token.is_punct and 
+                token.pos_ in ['NOUN', 'ADJ', 'VERB', 'PROPN'] and 
+                len(token.text) > 2):
+                important_tokens.append(token.lemma_)
+        
+        return {
+            'original': query,
+            'entities': entities,
+            'keywords': important_tokens,
+            'cleaned': ' '.join(important_tokens)
+        }
+
+    def _preprocess_with_nltk(self, query):
+        # Fallback usando NLTK
+        try:
             tokens = word_tokenize(query, language='spanish')
-            filtered_tokens = []
-            
-            for token in tokens:
-                if (token.lower() not in self.stop_words and 
-                    token.isalpha() and 
-                    len(token) > 2):
-                    stemmed = self.stemmer.stem(token.lower())
-                    filtered_tokens.append(stemmed)
-            
-            return {
-                'original': query,
-                'entities': [],
-                'keywords': filtered_tokens,
-                'cleaned': ' '.join(filtered_tokens)
-            }
+        except LookupError:
+            tokens = re.findall(r"\w+", query)
+        filtered_tokens = []
+        
+        for token in tokens:
+            if (token.lower() not in self.stop_words and 
+                token.isalpha() and 
+                len(token) > 2):
+                stemmed = self.stemmer.stem(token.lower())
+                filtered_tokens.append(stemmed)
+        
+        return {
+            'original': query,
+            'entities': [],
+            'keywords': filtered_tokens,
+            'cleaned': ' '.join(filtered_tokens)
+        }
 
     def extract_intent(self, query_data):
         """Extrae la intención de la consulta"""
         query = query_data['original']
         keywords = query_data['keywords']
         
-        intents = {
-            'search_place': ['buscar', 'encontrar', 'donde', 'ubicacion', 'lugar'],
-            'recommendation': ['recomendar', 'sugerir', 'mejor', 'top', 'buenos'],
-            'information': ['informacion', 'detalles', 'datos', 'sobre', 'que es'],
-            'comparison': ['comparar', 'diferencia', 'mejor que', 'versus'],
-            'activity': ['hacer', 'actividad', 'tour', 'visitar', 'experiencia'],
-            'food': ['comer', 'comida', 'restaurante', 'gastronomia', 'cocina'],
-            'accommodation': ['dormir', 'hotel', 'hospedaje', 'alojamiento']
-        }
+        intent_scores = {intent: 0 for intent in INTENTS}
+        for term in self.intent_matcher.find_terms(query):
+            for intent in self.intent_matcher.categories_by_term[term]:
+                intent_scores[intent] += 1
         
-        intent_scores = {}
-        for intent, intent_keywords in intents.items():
-            score = 0
-            for keyword in intent_keywords:
-                if keyword in query:
-                    score += 1
-                # Usar fuzzy matching para palabras similares
-                for kw in keywords:
-                    if fuzz.ratio(keyword, kw) > 80:
-                        score += 0.5
-            intent_scores[intent] = score
+        # Usar fuzzy matching para palabras similares: una matriz términos × palabras en C
+        if keywords:
+            scores = process.cdist(self.intent_terms, keywords, scorer=fuzz.ratio)
+            for term, matches in zip(self.intent_terms, (scores > 80).sum(axis=1)):
+                if matches:
+                    for intent in self.intent_matcher.categories_by_term[term]:
+                        intent_scores[intent] += 0.5 * matches
         
         return max(intent_scores, key=intent_scores.get) if intent_scores else 'search_place'
 
     def fuzzy_match_province(self, query_keywords):
         """Encuentra provincias usando fuzzy matching"""
-        best_matches = []
-        
-        for province, synonyms in self.province_mapping.items():
-            all_terms = [province] + synonyms
-            
-            for term in all_terms:
-                for keyword in query_keywords:
-                    ratio = fuzz.ratio(term.lower(), keyword.lower())
-                    if ratio > 70:  # Umbral de similitud
-                        best_matches.append((province, ratio, term))
-        
-        # Ordenar por mejor coincidencia
-        best_matches.sort(key=lambda x: x[1], reverse=True)
-        return best_matches[0][0] if best_matches else None
+        if not query_keywords:
+            return None
+        
+        # Filas: términos de provincia (en el orden del diccionario); columnas: palabras de la consulta
+        scores = process.cdist(
+            self.province_terms,
+            [keyword.lower() for keyword in query_keywords],
+            scorer=fuzz.ratio
+        )
+        best = scores.argmax()
+        term_idx = best // scores.shape[1]
+        if scores.flat[best] > 70:  # Umbral de similitud
+            return self.province_of_term[term_idx]
+        return None
 
     def semantic_search(self, query_data, search_type='all'):
         """Realiza búsqueda semántica usando diferentes estrategias"""
@@ -190,19 +269,18 @@ class OntologyRetriever:
             places = self.manager.search_places_by_province(province)
             results.extend([f"{p.name} ({province}): {p.desc}" for p in places[:3]])
         
-        # 2. Búsqueda por tipo de lugar con sinónimos
-        for place_type, synonyms in self.place_type_synonyms.items():
-            if any(syn in query_data['original'] for syn in [place_type] + synonyms):
-                places = self.manager.search_places_by_type(place_type)
-                results.extend([f"{p.name} ({place_type.title()}): {p.desc}" for p in places[:2]])
-                break
+        # 2. Búsqueda por tipo de lugar con sinónimos (el primero del diccionario que aparezca)
+        place_types = self.place_type_matcher.find_categories(query_data['original'])
+        if place_types:
+            place_type = place_types[0]
+            places = self.manager.search_places_by_type(place_type)
+            results.extend([f"{p.name} ({place_type.title()}): {p.desc}" for p in places[:2]])
         
         # 3. Búsqueda por actividades con sinónimos
-        for activity, synonyms in self.activity_synonyms.items():
-            if any(syn in query_data['original'] for syn in [activity] + synonyms):
-                places = self.manager.search_places_by_activity(activity)
-                results.extend([f"{p.name}: {p.desc}" for p in places[:2]])
-                break
+        activities = self.activity_matcher.find_categories(query_data['original'])
+        if activities:
+            places = self.manager.search_places_by_activity(activities[0])
+            results.extend([f"{p.name}: {p.desc}" for p in places[:2]])
         
         # 4. Búsqueda por palabras clave con TF-IDF
         if not results or len(results) < 3:
@@ -214,22 +292,13 @@ class OntologyRetriever:
     def _tfidf_search(self, query):
         """Búsqueda usando TF-IDF y similitud coseno"""
         try:
-            # Obtener todas las descripciones de lugares
-            all_places = self.manager.get_all_places()
-            if not all_places:
+            if self.tfidf_matrix is None:
                 return []
             
-            # Crear corpus de documentos
-            documents = [f"{place.name} {place.desc}" for place in all_places]
-            
-            # Vectorizar documentos y query
-            tfidf_matrix = self.vectorizer.fit_transform(documents + [query])
-            
-            # Calcular similitud coseno
-            query_vector = tfidf_matrix[-1]
-            doc_vectors = tfidf_matrix[:-1]
-            
-            similarities = cosine_similarity(query_vector, doc_vectors).flatten()
+            # Solo se transforma la query; las filas TF-IDF ya están normalizadas (L2),
+            # así que el producto disperso es directamente la similitud coseno
+            query_vector = self.vectorizer.transform([query])
+            similarities = (self.tfidf_matrix @ query_vector.T).toarray().ravel()
             
             # Obtener mejores coincidencias
             best_indices = similarities.argsort()[-3:][::-1]
@@ -237,23 +306,49 @@ class OntologyRetriever:
             results = []
             for idx in best_indices:
                 if similarities[idx] > 0.1:  # Umbral mínimo de similitud
-                    place = all_places[idx]
-                    results.append(f"{place.name}: {place.desc}")
+                    name, desc = self.tfidf_places[idx]
+                    results.append(f"{name}: {desc}")
             
             return results
         except Exception as e:
             print(f"Error en búsqueda TF-IDF: {e}")
             return []
 
+    def _cache_key(self, query):
+        # La versión de la ontología invalida los resultados al añadirse o cambiar lugares
+        return (normalize_query(query), self.manager.version)
+
     def retrieve(self, query):
         """Método principal de recuperación mejorado"""
         # Cache de consultas
-        if query in self.query_cache:
-            return self.query_cache[query]
+        key = self._cache_key(query)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return list(cached)
         
         # Preprocesar consulta
         query_data = self.preprocess_query(query)
+        results = self._retrieve_preprocessed(query_data)
         
+        # Guardar en cache
+        self.query_cache.set(key, list(results))
+        
+        return results
+
+    def retrieve_batch(self, queries):
+        """Recupera varias consultas preprocesándolas en un solo lote de spaCy (simuladores)"""
+        results = {}
+        for query in queries:
+            cached = self.query_cache.get(self._cache_key(query))
+            if cached is not None:
+                results[query] = list(cached)
+        pending = list(dict.fromkeys(q for q in queries if q not in results))
+        for query, query_data in zip(pending, self.preprocess_queries(pending)):
+            results[query] = self._retrieve_preprocessed(query_data)
+            self.query_cache.set(self._cache_key(query), list(results[query]))
+        return [results[query] for query in queries]
+
+    def _retrieve_preprocessed(self, query_data):
         # Extraer intención
         intent = self.extract_intent(query_data)
         
@@ -266,10 +361,6 @@ class OntologyRetriever:
             results = self._search_activities(query_data)
         else:
             results = self.semantic_search(query_data)
-        
-        # Guardar en cache
-        self.query_cache[query] = results
-        
         return results
 
     def _search_food_places(self, query_data):
@@ -310,10 +401,9 @@ class OntologyRetriever:
         results = []
         
         # Buscar por actividades específicas
-        for activity, synonyms in self.activity_synonyms.items():
-            if any(syn in query_data['original'] for syn in [activity] + synonyms):
-                places = self.manager.search_places_by_activity(activity)
-                results.extend([f"{p.name} - {activity.title()}: {p.desc}" for p in places[:2]])
+        for activity in self.activity_matcher.find_categories(query_data['original']):
+            places = self.manager.search_places_by_activity(activity)
+            results.extend([f"{p.name} - {activity.title()}: {p.desc}" for p in places[:2]])
         
         return results
 
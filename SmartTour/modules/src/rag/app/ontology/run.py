@@ -1,5 +1,26 @@
+import argparse
 from ontology_builder import OntologyBuilder
 
-builder = OntologyBuilder()
-builder.parse_json_folder(r"../../data/json")  # Cambia la ruta a tu carpeta de datos
-builder.save(r"../../data/tourism.owl")        # Guarda la ontología en formato OWL
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye la ontología turística a partir de los JSON scrapeados.")
+    parser.add_argument("--input", default=r"../../data/json", help="Carpeta con los JSON de datos")
+    parser.add_argument("--output", default=r"../../data/tourism.owl", help="Archivo OWL de salida")
+    parser.add_argument("--ntriples", help="Escribe en streaming a este archivo N-Triples en lugar del OWL (memoria acotada)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para parsear los JSON (por defecto, todos los núcleos)")
+    parser.add_argument("--incremental", action="store_true", help="Solo re-parsea los JSON que cambiaron desde la última construcción")
+    parser.add_argument("--manifest", help="Manifest de hashes y triples de los JSON (por defecto, <output>.manifest.json)")
+    args = parser.parse_args()
+    output = args.ntriples or args.output
+    manifest_path = args.manifest or output + ".manifest.json"
+
+    if args.incremental:
+        # Parte de los triples por archivo del manifest; el OWL (o N-Triples) se regenera al final
+        builder = OntologyBuilder(record=True)
+        stats = builder.build_incremental(args.input, manifest_path, workers=args.workers)
+        print(f"Ontología actualizada: {stats}")
+        builder.export(output)
+    else:
+        builder = OntologyBuilder(ntriples_path=args.ntriples, record=True)
+        builder.parse_json_folder(args.input, workers=args.workers)
+        builder.save(args.output)  # Guarda la ontología en formato OWL (o cierra el N-Triples)
+    builder.save_manifest(manifest_path)
@@ -1,22 +1,89 @@
+import copy
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 from .ollama_interface import OllamaClient
 from .retriever import Retriever
 from .ontology.retriever_ontology import OntologyRetriever
-from .fallback_scraper import search_dynamic
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
+from .fallback_scraper import new_session, search_dynamic
+from .http_cache import HTTPCache
+from .history_store import HistoryStore, SessionHistories
+from .embedding_cache import get_embedder, encode_query
+from .context_budget import ContextAssembler
+from .semantic_cache import SemanticAnswerCache
+
+# Hilos compartidos por todos los motores del proceso para las etapas de build_prompt
+_stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-stage")
+
+# Segundos máximos por etapa; lo que no termine a tiempo se omite del prompt
+DEFAULT_STAGE_TIMEOUTS = {
+    "documents": 5.0,
+    "ontology": 5.0,
+    "history": 3.0,
+    "fallback": 10.0,
+}
+
+def _stage_result(name, future, deadline, default):
+    """
+    Espera a la etapa hasta `deadline` (time.monotonic).
+    Devuelve (resultado, completada); si falla o no llega a tiempo, (default, False).
+    """
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic())), True
+    except FutureTimeout:
+        print(f"[RAG] ⏱️ Etapa '{name}' fuera de tiempo, se omite")
+    except Exception as e:
+        print(f"[RAG] ❌ Etapa '{name}' falló: {e}")
+    return default, False
 
 class RAGEngine:
+    """
+    Motor RAG con sus índices y cachés. Es costoso de crear: las páginas lo construyen una vez
+    por proceso (st.cache_resource) y lo comparten entre sesiones con with_rag().
+    """
+
     def __init__(self, config, use_rag=True):
         self.use_rag = use_rag
-        self.retriever = Retriever(config)
         self.ontology_retriever = OntologyRetriever(config)
+        # El índice de documentos incluye el conocimiento de fallback guardado en ejecuciones anteriores
+        self.retriever = Retriever(
+            config,
+            extra_documents=[{"content": place.desc} for place in self.ontology_retriever.manager.fallback_places],
+        )
         self.ollama = OllamaClient()
         self.config = config
-        self.embedder = SentenceTransformer(config["retriever"]["model"])  # Añadido para embeddings
+        self.embedder = get_embedder(config["retriever"]["model"])  # Añadido para embeddings
+        history_config = config.get("history", {})
+        self.histories = SessionHistories(
+            self.embedder,
+            max_sessions=history_config.get("max_sessions", 256),
+            session_ttl=history_config.get("session_ttl", 2 * 3600),
+        )
+        # Sesión y caché HTTP del scraping de fallback
+        self.http_session = new_session()
+        self.http_cache = HTTPCache()
+        # Presupuesto de tokens para el contexto recuperado
+        self.context_assembler = ContextAssembler(config.get("context", {}).get("max_tokens", 1024))
+        self.last_context_stats = None
+        self.stage_timeouts = {**DEFAULT_STAGE_TIMEOUTS, **config.get("pipeline", {}).get("timeouts", {})}
+        # Caché semántica de respuestas
+        cache_config = config.get("answer_cache", {})
+        self.answer_cache = SemanticAnswerCache(
+            threshold=cache_config.get("threshold", 0.92),
+            ttl=cache_config.get("ttl", 24 * 3600),
+            maxsize=cache_config.get("maxsize", 1024),
+        ) if cache_config.get("enabled", True) else None
+        self.restream_cached = cache_config.get("restream", True)
 
-    def build_prompt(self, query, chat_history, action_tag=None):
+    def with_rag(self, use_rag):
+        """Vista del motor con la recuperación activada o no; comparte índices, cachés e historiales."""
+        engine = copy.copy(self)
+        engine.use_rag = use_rag
+        engine.last_context_stats = None
+        return engine
+
+    def build_prompt(self, query, chat_history, action_tag=None, session_id=None):
         context = ""
         force_search = False
         summarize = False
@@ -25,65 +92,44 @@ class RAGEngine:
         if action_tag == "summarize":
             summarize = True
             
+        # Las etapas independientes se lanzan a la vez, cada una con su propio plazo
+        start = time.monotonic()
+        use_retrieval = self.use_rag and not force_search
+        futures = {}
+        if use_retrieval:
+            futures["documents"] = _stage_pool.submit(self.retriever.retrieve, query)
+            futures["ontology"] = _stage_pool.submit(self.ontology_retriever.retrieve, query)
+        if chat_history:
+            futures["history"] = _stage_pool.submit(self._history_text, query, chat_history, session_id)
+
+        # Etapas que no terminaron (fuera de tiempo o con error): no es lo mismo que "sin resultados"
+        incomplete = set()
+
+        def result(name, default):
+            if name not in futures:
+                return default
+            value, completed = _stage_result(name, futures[name], start + self.stage_timeouts[name], default)
+            if not completed:
+                incomplete.add(name)
+            return value
+
         if self.use_rag or force_search:
             # Combinar búsquedas: documentos tradicionales + ontología
-            docs = []
-            ontology_results = []
-            
-            if not force_search:
-                # Búsqueda en documentos tradicionales
-                docs = self.retriever.retrieve(query)
-                # Búsqueda en ontología
-                ontology_results = self.ontology_retriever.retrieve(query)
-            
-            # Combinar resultados
-            all_results = docs + ontology_results
-            
-            if all_results:
-                context = "\n".join(all_results)
-            else:
-                # Fallback a scraping dinámico
-                ecured_fallback = search_dynamic(query)
-                if ecured_fallback:
-                    context = ecured_fallback
-                    # Insertar conocimiento en ontología para futuras consultas
-                    from .ontology.ontology_manager import OntologyManager
-                    ontology_manager = OntologyManager(self.config["ontology"]["owl_path"])
-                    ontology_manager.insert_fallback_knowledge(
-                        name=query, 
-                        province="Unknown", 
-                        description=context
-                    )
-
-       
-        history_text = ""
-        if chat_history:
-            # Extraer solo el contenido de cada turno
-            contents = [turn.get("content", "") for turn in chat_history]
-            if contents:
-                # Calcular embeddings
-                query_emb = self.embedder.encode([query])
-                history_embs = self.embedder.encode(contents)
-
-                # Normalizar para similitud por coseno
-                query_emb = query_emb / np.linalg.norm(query_emb, axis=1, keepdims=True)
-                history_embs = history_embs / np.linalg.norm(history_embs, axis=1, keepdims=True)
-
-                # Crear índice FAISS para similitud por coseno (IndexFlatIP)
-                index = faiss.IndexFlatIP(history_embs.shape[1])
-                index.add(history_embs.astype(np.float32))
-                D, I = index.search(query_emb.astype(np.float32), min(10, len(contents)))
-                top_indices = I[0]
-
-                # Formatear solo los mensajes más similares
-                formatted_history = []
-                for idx in top_indices:
-                    turn = chat_history[idx]
-                    role = turn.get("role", "user")
-                    content = turn.get("content", "")
-                    formatted_history.append(f"{role.capitalize()}: {content}")
-                history_text = "\n".join(formatted_history)
-       
+            docs = result("documents", [])
+            ontology_results = result("ontology", [])
+
+            # Combinar resultados (ordenados por relevancia dentro de cada fuente)
+            rankings = [docs, ontology_results]
+
+            # Solo se recurre a la web (que además guarda el resultado en la ontología) si las etapas
+            # de recuperación terminaron y no encontraron nada; una etapa lenta no dispara el fallback
+            if not (docs or ontology_results) and not incomplete:
+                rankings = [self._fallback_context(query)]
+
+            # Solo entra en el prompt lo que cabe en el presupuesto de tokens
+            context, self.last_context_stats = self.context_assembler.assemble(rankings)
+
+        history_text = result("history", "")
 
         important_note = ""
         if action_tag == "important":
@@ -101,11 +147,90 @@ Question: {query}
 Answer:"""
         return prompt
 
-    def stream_answer(self, query, model_name, chat_history=None, action_tag=None):
-        prompt = self.build_prompt(query, chat_history, action_tag=action_tag)
-        return self.ollama.stream_generate(
+    def _fallback_context(self, query):
+        manager = self.ontology_retriever.manager
+        known_places = manager.search_places_by_name(query)
+        if known_places:
+            # Ya se obtuvo por fallback en una consulta anterior: se sirve localmente
+            return [f"{p.name}: {p.desc}" for p in known_places]
+
+        # Fallback a scraping dinámico (acotado por su propio plazo)
+        ecured_fallback = search_dynamic(
+            query, self.http_session, self.http_cache, deadline=self.stage_timeouts["fallback"]
+        )
+        if not ecured_fallback:
+            return []
+        contents = [result["content"] for result in ecured_fallback]
+        # Insertar conocimiento en la ontología (escritor persistente por lotes)
+        # y en el índice vectorial para futuras consultas
+        place = manager.insert_fallback_knowledge(
+            name=query, 
+            province="Unknown", 
+            description="\n\n".join(contents)
+        )
+        self.retriever.add_documents([{"content": place.desc}])
+        return contents
+
+    def _history_text(self, query, chat_history, session_id=None):
+        # Historial indexado por sesión: solo se codifican los turnos nuevos
+        if session_id is not None:
+            store = self.histories.get(session_id)
+        else:
+            store = HistoryStore(self.embedder)
+        store.sync(chat_history)
+
+        # Formatear solo los mensajes más similares
+        query_emb = encode_query(self.config["retriever"]["model"], query)
+        formatted_history = []
+        for turn in store.most_relevant(query_emb, 10):
+            role = turn.get("role", "user")
+            content = turn.get("content", "")
+            formatted_history.append(f"{role.capitalize()}: {content}")
+        return "\n".join(formatted_history)
+
+    @property
+    def kb_version(self):
+        """Versión de la base de conocimiento: cambia al modificarse la ontología o los documentos."""
+        if not self.use_rag:
+            return "no-rag"
+        return f"{self.ontology_retriever.manager.version}:{len(self.retriever.passages)}"
+
+    def stream_answer(self, query, model_name, chat_history=None, action_tag=None, session_id=None):
+        # Solo las preguntas independientes pasan por la caché, es decir, el primer turno de una sesión
+        # y sin acción: el historial y las acciones (también "important") cambian el prompt, y no forman
+        # parte de la clave de la caché
+        cacheable = self.answer_cache is not None and not chat_history and action_tag is None
+        if cacheable:
+            query_emb = encode_query(self.config["retriever"]["model"], query)
+            cached = self.answer_cache.lookup(query_emb, model_name, self.kb_version)
+            if cached is not None:
+                return self._replay(cached["answer"])
+
+        prompt = self.build_prompt(query, chat_history, action_tag=action_tag, session_id=session_id)
+        tokens = self.ollama.stream_generate(
             model=model_name,
             prompt=prompt,
             temperature=self.config["llm"]["temperature"],
             max_tokens=self.config["llm"]["max_tokens"],
         )
+        if not cacheable:
+            return tokens
+        return self._store_after_stream(tokens, query, query_emb, model_name)
+
+    def _replay(self, answer):
+        """Entrega una respuesta cacheada de una vez o palabra a palabra, como si llegara del modelo."""
+        if not self.restream_cached:
+            yield answer
+            return
+        for word in re.findall(r"\S+\s*", answer):
+            yield word
+
+    def _store_after_stream(self, tokens, query, query_emb, model_name):
+        # La versión se toma al terminar: el fallback puede haber añadido conocimiento en este turno
+        parts = []
+        for token in tokens:
+            parts.append(token)
+            yield token
+        answer = "".join(parts).strip()
+        if answer:
+            self.answer_cache.store(query, query_emb, model_name, self.kb_version, answer)
@@ -1,32 +1,90 @@
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
+import atexit
 import json
-import os
+import threading
+import time
+from .chunker import chunk_documents
+from .vector_index import VectorIndex
+from .embedding_cache import get_embedder, encode_query
+from .bm25 import BM25Index, corpus_fingerprint, reciprocal_rank_fusion
 
 class Retriever:
-    def __init__(self, config, kb_path="modules/src/rag/data/knowledge_base.json"):
-        self.model = SentenceTransformer(config["retriever"]["model"])
+    def __init__(self, config, kb_path="modules/src/rag/data/knowledge_base.json", extra_documents=None):
+        """
+        extra_documents: documentos añadidos fuera de la base de conocimiento (conocimiento de fallback
+        de ejecuciones anteriores); se indexan después de ella y en el mismo orden en que se añadieron.
+        """
+        self.model_name = config["retriever"]["model"]
+        self.model = get_embedder(self.model_name)
         self.k = config["retriever"]["top_k"]
-        self.documents = self._load_documents(kb_path)
-        self.index, self.doc_map = self._build_index()
+        self.chunk_size = config["retriever"].get("chunk_size", 200)
+        self.chunk_overlap = config["retriever"].get("chunk_overlap", 40)
+        self.index_dtype = config["retriever"].get("index_dtype", "float32")
+        self.documents = self._load_documents(kb_path) + list(extra_documents or [])
+        # Se indexan pasajes solapados en lugar de documentos completos
+        self.passages = chunk_documents(self.documents, self.chunk_size, self.chunk_overlap)
+        self.index = self._build_index()
+        # Índice disperso BM25 sobre los mismos pasajes, persistido junto a la base de conocimiento
+        self.rrf_k = config["retriever"].get("rrf_k", 60)
+        self.bm25_path = config["retriever"].get("bm25_index")
+        self.bm25 = BM25Index.load_or_build(self.bm25_path, [p["text"] for p in self.passages])
+        # Las búsquedas y las inserciones de fallback comparten los índices entre hilos
+        self._lock = threading.RLock()
+        # Las inserciones solo marcan el índice BM25 como modificado; se guarda como mucho cada
+        # `bm25_save_interval` segundos y al terminar el proceso
+        self.bm25_save_interval = config["retriever"].get("bm25_save_interval", 60)
+        self._bm25_dirty = False
+        self._bm25_saved_at = time.monotonic()
+        if self.bm25_path:
+            atexit.register(self.flush)
 
     def _load_documents(self, path):
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    def add_documents(self, documents):
+        """Indexa al momento documentos nuevos (p. ej. conocimiento obtenido por fallback)."""
+        passages = chunk_documents(documents, self.chunk_size, self.chunk_overlap)
+        embeddings = self.model.encode([p["text"] for p in passages]) if passages else None
+        with self._lock:
+            first_doc = len(self.documents)
+            self.documents.extend(documents)
+            if not passages:
+                return
+            for passage in passages:
+                passage["doc_id"] += first_doc
+            self.passages.extend(passages)
+            self.index.add(embeddings)
+            self.bm25.add_documents([p["text"] for p in passages])
+            self._bm25_dirty = True
+            if time.monotonic() - self._bm25_saved_at >= self.bm25_save_interval:
+                self.flush()
+
+    def flush(self):
+        """Guarda el índice BM25 si cambió desde el último guardado."""
+        with self._lock:
+            if not (self._bm25_dirty and self.bm25_path):
+                return
+            # El índice persistido pasa a cubrir también los documentos añadidos
+            self.bm25.fingerprint = corpus_fingerprint([p["text"] for p in self.passages])
+            self.bm25.save(self.bm25_path)
+            self._bm25_dirty = False
+            self._bm25_saved_at = time.monotonic()
+
     def _build_index(self):
-        embeddings = []
-        doc_map = {}
-        for i, doc in enumerate(self.documents):
-            emb = self.model.encode(doc["content"])
-            embeddings.append(emb)
-            doc_map[i] = doc["content"]
-        index = faiss.IndexFlatL2(len(embeddings[0]))
-        index.add(np.array(embeddings))
-        return index, doc_map
+        embeddings = self.model.encode([p["text"] for p in self.passages])
+        return VectorIndex.from_embeddings(embeddings, self.index_dtype)
+
+    def retrieve_passages(self, query):
+        """Devuelve los pasajes más relevantes con su documento de origen y offsets."""
+        # Se piden más candidatos a cada índice para que la fusión tenga donde elegir
+        n_candidates = self.k * 4
+        query_vec = encode_query(self.model_name, query)
+        with self._lock:
+            D, I = self.index.search(query_vec, n_candidates)
+            dense_ids = [int(i) for i in I[0] if i != -1]
+            sparse_ids = [i for i, _ in self.bm25.search(query, n_candidates)]
+            fused = reciprocal_rank_fusion([dense_ids, sparse_ids], k=self.rrf_k)
+            return [self.passages[i] for i in fused[: self.k]]
 
     def retrieve(self, query):
-        query_vec = self.model.encode(query)
-        D, I = self.index.search(np.array([query_vec]), self.k)
-        return [self.doc_map[i] for i in I[0]]
+        return [p["text"] for p in self.retrieve_passages(query)]
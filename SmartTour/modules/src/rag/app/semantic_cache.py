@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+
+from .vector_index import normalize
+
+
+class SemanticAnswerCache:
+    """
+    Caché de respuestas del asistente indexada por el embedding de la pregunta.
+    Una pregunta nueva reutiliza la respuesta de otra anterior si su similitud coseno supera `threshold`,
+    fue generada con el mismo modelo y la misma versión de la base de conocimiento, y no ha caducado (`ttl`).
+    Las entradas se agrupan por versión: las de versiones anteriores dejan de servirse en cuanto la base
+    cambia y salen por TTL o por tamaño, y alternar entre versiones (p. ej. con y sin RAG) no vacía la caché.
+    """
+
+    def __init__(self, threshold=0.92, ttl=24 * 3600, maxsize=1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # kb_version -> [entrada]
+        # kb_version -> embeddings apilados (se recalculan al cambiar las entradas)
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _expire(self):
+        now = time.time()
+        for version, entries in list(self._entries.items()):
+            alive = [entry for entry in entries if now - entry["created"] < self.ttl]
+            if len(alive) != len(entries):
+                self._set_entries(version, alive)
+
+    def _set_entries(self, version, entries):
+        self._matrices.pop(version, None)
+        if entries:
+            self._entries[version] = entries
+        else:
+            self._entries.pop(version, None)
+
+    def lookup(self, query_embedding, model, kb_version):
+        """Devuelve la entrada más parecida ({query, answer, similarity...}) o None."""
+        with self._lock:
+            self._expire()
+            entries = self._entries.get(kb_version)
+            if entries:
+                if kb_version not in self._matrices:
+                    self._matrices[kb_version] = np.vstack(
+                        [entry["embedding"] for entry in entries]
+                    )
+                similarities = (
+                    self._matrices[kb_version] @ normalize(query_embedding)[0]
+                )
+                for idx in np.argsort(-similarities):
+                    if similarities[idx] < self.threshold:
+                        break
+                    entry = entries[idx]
+                    if entry["model"] == model:
+                        self.hits += 1
+                        return {**entry, "similarity": float(similarities[idx])}
+            self.misses += 1
+            return None
+
+    def store(self, query, query_embedding, model, kb_version, answer):
+        with self._lock:
+            entries = self._entries.get(kb_version, [])
+            self._set_entries(
+                kb_version,
+                entries
+                + [
+                    {
+                        "query": query,
+                        "embedding": normalize(query_embedding)[0],
+                        "model": model,
+                        "answer": answer,
+                        "created": time.time(),
+                    }
+                ],
+            )
+            # Al superar el tamaño máximo se descarta la entrada más antigua de cualquier versión
+            while len(self) > self.maxsize:
+                version = min(
+                    self._entries, key=lambda v: self._entries[v][0]["created"]
+                )
+                self._set_entries(version, self._entries[version][1:])
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._matrices = {}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "versions": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,66 @@
+import faiss
+import numpy as np
+
+# Tipos de almacenamiento soportados además de float32 (cuantización escalar de FAISS)
+_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def normalize(embeddings):
+    """Convierte a float32 y normaliza (L2) cada fila para usar similitud coseno."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[np.newaxis, :]
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+class VectorIndex:
+    """
+    Índice de similitud coseno compartido por el RAG, el buscador y el historial del chat.
+    Los embeddings se normalizan una sola vez al indexar y la búsqueda es por producto interno.
+    `dtype` puede ser "float32", "float16" o "int8" (los dos últimos reducen la memoria).
+    """
+
+    def __init__(self, dim, dtype="float32"):
+        self.dim = dim
+        self.dtype = dtype
+        if dtype == "float32":
+            self.index = faiss.IndexFlatIP(dim)
+        elif dtype in _QUANTIZERS:
+            self.index = faiss.IndexScalarQuantizer(
+                dim, _QUANTIZERS[dtype], faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            raise ValueError(f"Tipo de almacenamiento no soportado: {dtype}")
+
+    @classmethod
+    def from_embeddings(cls, embeddings, dtype="float32"):
+        vectors = normalize(embeddings)
+        index = cls(vectors.shape[1], dtype)
+        index.add(vectors, normalized=True)
+        return index
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def add(self, embeddings, normalized=False):
+        vectors = embeddings if normalized else normalize(embeddings)
+        if len(vectors) == 0:
+            return
+        if not self.index.is_trained:
+            # La cuantización int8 aprende los rangos con el primer lote
+            self.index.train(vectors)
+        self.index.add(vectors)
+
+    def search(self, query_embeddings, k):
+        """Devuelve (puntuaciones coseno, posiciones) de los k vecinos más cercanos por consulta."""
+        queries = normalize(query_embeddings)
+        k = min(k, len(self))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        return self.index.search(queries, k)
@@ -1,7 +1,7 @@
-from sentence_transformers import SentenceTransformer, util
 import os, json
-import numpy as np
 import pickle
+from ...rag.app.vector_index import VectorIndex, normalize
+from ...rag.app.embedding_cache import get_embedder, encode_query
 
 
 class Retriever:
@@ -10,18 +10,26 @@ class Retriever:
         model_name="all-MiniLM-L6-v2",
         data_dir="modules/src/searcher/data/documents",
         embedding_cache="modules/src/searcher/embeddings/doc_embeddings.pkl",
+        index_dtype="float32",
     ):
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = get_embedder(model_name)
         self.data_dir = data_dir
         self.embedding_cache = embedding_cache
         self.documents = []
         self.embeddings = None
+        self.index_dtype = index_dtype
         self.load_documents()
+        self.index = VectorIndex.from_embeddings(self.embeddings, self.index_dtype)
 
     def load_documents(self):
         if os.path.exists(self.embedding_cache):
             with open(self.embedding_cache, "rb") as f:
-                self.documents, self.embeddings = pickle.load(f)
+                self.documents, embeddings = pickle.load(f)
+            # Cachés antiguas guardan tensores de torch sin normalizar
+            if hasattr(embeddings, "cpu"):
+                embeddings = embeddings.cpu().numpy()
+            self.embeddings = normalize(embeddings)
         else:
             for filename in os.listdir(self.data_dir):
                 if filename.endswith(".json"):
@@ -34,20 +42,17 @@ class Retriever:
                             doc["doc_id"] = os.path.splitext(filename)[0]
                         self.documents.append(doc)
             texts = [doc["title"] + " " + doc["content"] for doc in self.documents]
-            self.embeddings = self.model.encode(
-                texts, convert_to_tensor=True, show_progress_bar=True
+            self.embeddings = normalize(
+                self.model.encode(texts, show_progress_bar=True)
             )
             with open(self.embedding_cache, "wb") as f:
                 pickle.dump((self.documents, self.embeddings), f)
 
     def search(self, query, top_k=5):
-        query_emb = self.model.encode(query, convert_to_tensor=True)
-        scores = util.cos_sim(query_emb, self.embeddings)[0]
-        n_docs = len(self.documents)
-        top_k = min(top_k, n_docs)
-        top_results = np.argpartition(-scores, range(top_k))[:top_k]
-        ranked = sorted(
-            [(self.documents[i], float(scores[i])) for i in top_results],
-            key=lambda x: -x[1],
-        )
-        return ranked
+        query_emb = encode_query(self.model_name, query)
+        scores, ids = self.index.search(query_emb, top_k)
+        return [
+            (self.documents[i], float(score))
+            for i, score in zip(ids[0], scores[0])
+            if i != -1
+        ]
@@ -1,3 +1,4 @@
 #!/usr/bin/env bash
+# Recursos de NLTK / spaCy (solo descarga lo que falte)
+python SmartTour/modules/src/rag/app/ontology/nlp_resources.py
 streamlit run SmartTour/main.py
-
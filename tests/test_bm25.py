@@ -0,0 +1,31 @@
+from src.rag.app.bm25 import BM25Index, reciprocal_rank_fusion
+
+
+def test_bm25_search():
+    index = BM25Index.build(
+        [
+            "Playas de Varadero en Matanzas",
+            "El valle de Viñales en Pinar del Río",
+            "Museos de La Habana Vieja",
+        ]
+    )
+    results = index.search("vinales", k=3)
+    assert [doc_id for doc_id, _ in results] == [1]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]])
+    assert fused[0] == 1
+    assert set(fused) == {1, 2, 3, 4}
+
+
+def test_load_or_build_rebuilds_corrupt_index(tmp_path):
+    path = tmp_path / "bm25_index.pkl"
+    texts = ["Playas de Varadero", "Museos de La Habana Vieja"]
+    BM25Index.load_or_build(str(path), texts)
+    path.write_bytes(path.read_bytes()[:20])  # archivo truncado
+
+    index = BM25Index.load_or_build(str(path), texts)
+    assert [doc_id for doc_id, _ in index.search("habana")] == [1]
+    assert BM25Index.load_or_build(str(path), texts).fingerprint == index.fingerprint
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,38 @@
+from src.rag.app.cache import LRUCache
+
+
+def test_lru_cache_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" pasa a ser el más reciente
+    cache.set("c", 3)  # expulsa "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 2)
+
+
+def test_lru_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.rag.app.cache.time.time", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl=5)
+    cache.set("q", "v")
+    assert cache.get("q") == "v"
+    now[0] += 6
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_save_and_load_skip_expired(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = LRUCache(maxsize=4, ttl=60)
+    cache.set(("playas", "v1"), ["Varadero"])
+    cache._data["viejo"] = ("x", 0)  # entrada ya caducada
+    cache.save(path)
+
+    restored = LRUCache(maxsize=4, ttl=60)
+    assert restored.load(path) == 1
+    assert restored.get(("playas", "v1")) == ["Varadero"]
+    assert restored.get("viejo") is None
+    assert LRUCache().load(str(tmp_path / "no_existe.pkl")) == 0
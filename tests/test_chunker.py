@@ -0,0 +1,21 @@
+from src.rag.app.chunker import chunk_text, chunk_documents
+
+
+def test_chunk_text():
+    text = " ".join(f"w{i}" for i in range(10))
+    chunks = chunk_text(text, chunk_size=4, overlap=1)
+    assert [c[2].split()[0] for c in chunks] == ["w0", "w3", "w6"]
+    # Los offsets apuntan al texto original
+    for start, end, passage in chunks:
+        assert text[start:end] == passage
+    assert chunks[-1][2].endswith("w9")
+
+
+def test_chunk_documents():
+    docs = [{"content": "uno dos tres"}, {"content": ""}, {"content": "cuatro"}]
+    passages = chunk_documents(docs, chunk_size=2, overlap=0)
+    assert [(p["doc_id"], p["text"]) for p in passages] == [
+        (0, "uno dos"),
+        (0, "tres"),
+        (2, "cuatro"),
+    ]
@@ -0,0 +1,21 @@
+import os
+
+from src.rag.app.config import load_config
+
+CONFIG_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "SmartTour", "modules", "src", "rag", "config.yaml"
+)
+
+
+def test_shipped_config_parses_with_expected_sections():
+    config = load_config(CONFIG_PATH)
+    assert set(config["pipeline"]["timeouts"]) == {
+        "documents",
+        "ontology",
+        "history",
+        "fallback",
+    }
+    assert config["answer_cache"]["threshold"] > 0
+    assert config["ontology"]["owl_path"].endswith(".owl")
+    assert config["ontology"]["query_cache"]["maxsize"] > 0
+    assert {"model", "top_k"} <= set(config["retriever"])
@@ -0,0 +1,36 @@
+from src.rag.app.context_budget import ContextAssembler, approx_token_count
+
+
+def test_context_assembler_dedupes_and_respects_budget():
+    docs = ["Viñales es un valle de Pinar del Río.", "Trinidad es una ciudad colonial."]
+    ontology = [
+        "viñales es un valle de pinar del rio",
+        "Varadero tiene playas de arena blanca.",
+    ]
+    budget = approx_token_count(docs[0]) + approx_token_count(docs[1]) + 2
+    context, stats = ContextAssembler(max_tokens=budget).assemble([docs, ontology])
+
+    assert stats["duplicates"] == 1
+    assert stats["used_tokens"] <= budget
+    assert stats["used"] == 2 and stats["dropped"] == 1
+    assert context.splitlines() == docs
+
+
+def test_context_assembler_truncates_single_oversized_snippet():
+    text = " ".join(["palabra"] * 100)
+    context, stats = ContextAssembler(max_tokens=20).assemble([[text]])
+    assert context and approx_token_count(context) <= 20
+    assert stats["used"] == 1 and stats["dropped_tokens"] > 0
+
+
+def test_context_assembler_dedupes_whole_words_only():
+    ranking = [
+        "Los cubanos celebran el carnaval.",
+        "Cuba",
+        "Marina Hemingway",
+        "Mar",
+        "el carnaval",
+    ]
+    context, stats = ContextAssembler(max_tokens=1024).assemble([ranking])
+    assert stats["duplicates"] == 1
+    assert context.splitlines() == ranking[:4]
@@ -0,0 +1,60 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.rag.app import fallback_scraper
+from src.rag.app.http_cache import HTTPCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """DuckDuckGo de pega: /html/ lista dos resultados; /slow tarda más que el deadline."""
+
+    def do_GET(self):
+        port = self.server.server_address[1]
+        if self.path.startswith("/html/"):
+            body = (
+                f'<a class="result__a" href="http://127.0.0.1:{port}/fast">Rápido</a>'
+                f'<a class="result__a" href="http://127.0.0.1:{port}/slow">Lento</a>'
+            )
+        elif self.path == "/fast":
+            body = "<p>Varadero tiene playas de arena blanca.</p>"
+        else:
+            time.sleep(2)
+            body = "<p>Esta página llega tarde.</p>"
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def search_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(fallback_scraper, "random_user_agent", lambda: "test")
+    monkeypatch.setattr(
+        fallback_scraper, "search_wikipedia", lambda query, cache, lang="es": None
+    )
+    yield f"http://127.0.0.1:{server.server_address[1]}/html/"
+    server.shutdown()
+
+
+def test_search_dynamic_returns_partial_results_at_deadline(search_url, tmp_path):
+    session = fallback_scraper.new_session()
+    cache = HTTPCache(str(tmp_path / "http_cache.sqlite"))
+    start = time.monotonic()
+    results = fallback_scraper.search_dynamic(
+        "varadero", session, cache, deadline=1.0, search_url=search_url
+    )
+    assert time.monotonic() - start < 1.8
+    assert results == [
+        {"source": "duckduckgo_1", "content": "Varadero tiene playas de arena blanca."}
+    ]
@@ -0,0 +1,26 @@
+import numpy as np
+
+from src.rag.app import history_store
+from src.rag.app.history_store import SessionHistories
+
+
+class FakeEmbedder:
+    def encode(self, texts):
+        return np.ones((len(texts), 4), dtype="float32")
+
+
+def test_session_histories_are_bounded_by_size_and_idle_time(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(history_store.time, "monotonic", lambda: now[0])
+    histories = SessionHistories(FakeEmbedder(), max_sessions=2, session_ttl=50)
+
+    first = histories.get("a")
+    first.sync([{"role": "user", "content": "hola"}])
+    histories.get("b")
+    assert histories.get("a") is first
+    histories.get("c")
+    assert list(histories._stores) == ["a", "c"]  # "b" era la menos reciente
+
+    now[0] = 100.0
+    histories.get("d")
+    assert list(histories._stores) == ["d"]
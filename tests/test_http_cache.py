@@ -0,0 +1,13 @@
+from src.rag.app.http_cache import HTTPCache
+
+
+def test_expired_entries_are_purged_periodically(tmp_path):
+    cache = HTTPCache(str(tmp_path / "http_cache.sqlite"), ttl=60, purge_every=2)
+    cache._store("https://example.org/a", "cuerpo", None, None)
+    cache._conn.execute("UPDATE responses SET fetched_at = 0")
+    assert cache._lookup("https://example.org/a") is not None
+
+    cache.set_result("consulta", ["resumen"])  # segunda escritura: purga
+    assert cache._lookup("https://example.org/a") is None
+    assert cache._conn.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 0
+    assert cache.get_result("consulta") == ["resumen"]
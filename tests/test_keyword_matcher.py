@@ -0,0 +1,21 @@
+from src.rag.app.ontology.keyword_matcher import KeywordMatcher
+
+
+def test_keyword_matcher_matches_substrings_like_in_operator():
+    mapping = {
+        "restaurante": ["paladar", "bar"],
+        "playa": ["costa", "cayeria"],
+        "taberna": ["barra"],
+    }
+    matcher = KeywordMatcher(mapping)
+    text = "Busco una barra en la Costa"
+    expected = {
+        term
+        for category, terms in mapping.items()
+        for term in [category] + terms
+        if term in text.lower()
+    }
+    # "bar" es prefijo de "barra": ambos se detectan aunque compartan posición
+    assert matcher.find_terms(text) == expected == {"bar", "barra", "costa"}
+    assert matcher.find_categories(text) == ["restaurante", "playa", "taberna"]
+    assert matcher.find_categories("nada que ver") == []
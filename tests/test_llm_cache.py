@@ -0,0 +1,52 @@
+from src.rag.app.llm_cache import LLMCache
+
+
+class FakeGeneration:
+    def __init__(self, text):
+        self.text = text
+        self.error = None
+
+
+class FakeEvent:
+    def __init__(self, text, done=False):
+        self.text = text
+        self.done = done
+        self.error = None
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, model, prompt, temperature, max_tokens):
+        self.calls += 1
+        return FakeGeneration(f"{prompt}!")
+
+    def stream_events(self, model, prompt, temperature, max_tokens):
+        self.calls += 1
+        yield FakeEvent(prompt)
+        yield FakeEvent("!", done=True)
+
+
+def test_llm_cache_reuses_completions_and_evicts_lru(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), max_entries=2)
+    client = FakeClient()
+    assert cache.generate(client, "m", "a") == "a!"
+    assert cache.generate(client, "m", "a") == "a!"
+    assert client.calls == 1
+    # Otra temperatura es otra clave
+    cache.generate(client, "m", "a", temperature=0.0)
+    assert client.calls == 2
+    cache.generate(client, "m", "b")  # expulsa ("m", "a", 0.7), el menos usado
+    assert len(cache) == 2
+    assert cache.get("m", "a", 0.7, 512) is None
+    assert cache.get("m", "b", 0.7, 512) == "b!"
+
+
+def test_llm_cache_stream_stores_joined_completion(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    client = FakeClient()
+    assert list(cache.stream(client, "m", "hola")) == ["hola", "!"]
+    # El acierto de caché se entrega en un solo fragmento y no llama al modelo
+    assert list(cache.stream(client, "m", "hola")) == ["hola!"]
+    assert client.calls == 1
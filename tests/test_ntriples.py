@@ -0,0 +1,115 @@
+import json
+
+from rdflib import RDF, Graph, Literal
+
+from src.rag.app.ontology.ontology_builder import EX, OntologyBuilder
+
+
+def test_streamed_ntriples_round_trip_multiline_literals(tmp_path):
+    path = tmp_path / "tourism.nt"
+    description = 'Primer párrafo.\n\nSegundo párrafo con "comillas".'
+    builder = OntologyBuilder(ntriples_path=str(path))
+    place_uri = builder.add_place("Viñales\nValle", "Pinar del Río", [], description)
+    builder.close()
+
+    graph = Graph()
+    graph.parse(str(path), format="nt")
+    assert (place_uri, EX.hasDescription, Literal(description)) in graph
+    assert (place_uri, EX.hasName, Literal("Viñales\nValle")) in graph
+
+
+def test_fallback_store_round_trip_through_compiled_cache(tmp_path):
+    from src.rag.app.ontology.ontology_manager import OntologyManager
+
+    owl_path = str(tmp_path / "tourism.owl")
+    builder = OntologyBuilder()
+    builder.add_place("Trinidad", "Sancti Spíritus", [], "Ciudad colonial.")
+    builder.save(owl_path)
+
+    manager = OntologyManager(owl_path)
+    description = "Primer párrafo.\n\nSegundo párrafo."
+    manager.insert_fallback_knowledge("Cayo Jutías", "Unknown", description)
+    manager.fallback_writer.flush()
+
+    reloaded = OntologyManager(owl_path)
+    assert [p.desc for p in reloaded.search_places_by_name("cayo jutias")] == [
+        description
+    ]
+    assert (
+        reloaded.fallback_offset
+        == (tmp_path / "tourism.owl.fallback.nt").stat().st_size
+    )
+    # La tercera carga sale entera de la caché compilada
+    again = OntologyManager(owl_path)
+    assert again.fallback_places == reloaded.fallback_places
+    assert again.version == reloaded.version
+
+
+def _write_place(path, title, province, description):
+    data = {
+        "titulo": title,
+        "url": f"https://example.org/{title}",
+        "secciones": [{"fragmentos": [f"Zona {province}", description]}],
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_incremental_build_replaces_only_changed_file(tmp_path, monkeypatch):
+    from src.rag.app.ontology import ontology_builder
+
+    folder = tmp_path / "json"
+    folder.mkdir()
+    manifest_path = str(tmp_path / "tourism.nt.manifest.json")
+    _write_place(
+        folder / "a.json",
+        "Capitolio",
+        "La Habana",
+        "Edificio histórico en el centro de la ciudad.",
+    )
+    _write_place(
+        folder / "b.json",
+        "Malecon",
+        "La Habana",
+        "Paseo marítimo junto al mar, muy concurrido.",
+    )
+
+    builder = OntologyBuilder(record=True)
+    assert (
+        builder.build_incremental(str(folder), manifest_path, workers=1)["added"] == 2
+    )
+    builder.save_manifest(manifest_path)
+    with open(manifest_path, encoding="utf-8") as f:
+        before = json.load(f)
+
+    # a.json declaró la provincia compartida; al cambiarla, b.json conserva su propia declaración
+    _write_place(
+        folder / "a.json",
+        "Capitolio",
+        "Matanzas",
+        "Edificio histórico, ahora en otra provincia.",
+    )
+    parsed = []
+    parse = ontology_builder.parse_place_file
+    monkeypatch.setattr(
+        ontology_builder, "parse_place_file", lambda p: parsed.append(p) or parse(p)
+    )
+
+    builder = OntologyBuilder(record=True)
+    stats = builder.build_incremental(str(folder), manifest_path, workers=1)
+    assert stats == {"added": 0, "updated": 1, "removed": 0, "unchanged": 1}
+    assert parsed == [str(folder / "a.json")]
+    assert builder.manifest["b.json"] == before["b.json"]
+    assert builder.manifest["a.json"]["ntriples"] != before["a.json"]["ntriples"]
+
+    out = str(tmp_path / "tourism.nt")
+    builder.export(out)
+    graph = Graph()
+    graph.parse(out, format="nt")
+    assert {str(o) for o in graph.objects(None, EX.hasDescription)} == {
+        "Edificio histórico, ahora en otra provincia.",
+        "Paseo marítimo junto al mar, muy concurrido.",
+    }
+    assert set(graph.subjects(RDF.type, EX.Province)) == {
+        EX.province_la_habana,
+        EX.province_matanzas,
+    }
@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.rag.app.semantic_cache import SemanticAnswerCache
+
+
+def test_semantic_cache_matches_similar_queries_per_model_and_version():
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=3)
+    cache.store(
+        "playas en Varadero",
+        np.array([1.0, 0.0, 0.0]),
+        "m",
+        "v1",
+        "Varadero tiene playas.",
+    )
+
+    hit = cache.lookup(np.array([0.95, 0.1, 0.0]), "m", "v1")
+    assert hit["answer"] == "Varadero tiene playas." and hit["similarity"] > 0.9
+    # Pregunta distinta, otro modelo y base de conocimiento cambiada
+    assert cache.lookup(np.array([0.0, 1.0, 0.0]), "m", "v1") is None
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), "otro", "v1") is None
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), "m", "v2") is None
+
+    # Guardar en otra versión (p. ej. sin RAG) no descarta las entradas de v1
+    cache.store(
+        "playas en Varadero", np.array([1.0, 0.0, 0.0]), "m", "no-rag", "Sin contexto."
+    )
+    assert (
+        cache.lookup(np.array([1.0, 0.0, 0.0]), "m", "v1")["answer"]
+        == "Varadero tiene playas."
+    )
+    assert (
+        cache.lookup(np.array([1.0, 0.0, 0.0]), "m", "no-rag")["answer"]
+        == "Sin contexto."
+    )
+
+
+def test_semantic_cache_evicts_oldest_and_expires():
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=2)
+    for i, version in enumerate(["v1", "v2", "v1"]):
+        vector = np.zeros(3)
+        vector[i] = 1.0
+        cache.store(f"q{i}", vector, "m", version, f"a{i}")
+    assert len(cache) == 2
+    # La más antigua salió
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), "m", "v1") is None
+    assert cache.lookup(np.array([0.0, 0.0, 1.0]), "m", "v1")["answer"] == "a2"
+
+    cache.ttl = 0
+    assert cache.lookup(np.array([0.0, 0.0, 1.0]), "m", "v1") is None
+    assert len(cache) == 0